@@ -5,9 +5,11 @@ import os
 import logging
 import time # To auto remove birthday role on the next day.
 import asyncio
+import bisect
 from datetime import datetime, timedelta
-from threading import Lock
+import heapq
 import discord
+import pytz
 from discord.ext import commands
 from cogs.utils.paginator import Pages # For making pages, requires the util!
 from cogs.utils.dataIO import dataIO
@@ -24,9 +26,15 @@ KEY_BDAY_DAY = "birthdateDay"
 KEY_IS_ASSIGNED = "isAssigned"
 KEY_DATE_SET_MONTH = "dateAssignedMonth"
 KEY_DATE_SET_DAY = "dateAssignedDay"
+KEY_TIMEZONE = "timezone"
 LOGGER = None
 SAVE_FOLDER = "data/lui-cogs/birthday/" #Path to save folder.
 SAVE_FILE = "settings.json"
+ROLE_WORKERS = 5 # Max number of servers to change birthday roles on at once.
+ROLE_RETRIES = 4 # Max number of attempts for a role change.
+ROLE_BACKOFF = 2 # Base delay in seconds between attempts, doubled every retry.
+ROLE_PROGRESS = 50 # Log progress every this many role changes.
+MAX_SLEEP = 3600 # Max time in seconds the birthday loop sleeps between checks.
 
 def checkFolder():
     """Used to create the data folder at first startup"""
@@ -43,34 +51,233 @@ def checkFiles():
         dataIO.save_json(myFile, {})
 
 
+class BirthdayEntries:
+    """List of birthday list entries that are only formatted when accessed.
+
+    This lets the paginator build each page's text when the page is shown.
+    """
+
+    def __init__(self, birthdays):
+        """
+        Parameters:
+        -----------
+        birthdays: [(int, int, discord.Member)]
+            The (month, day, member) of each birthday, in the order to display.
+        """
+        self.birthdays = birthdays
+
+    def __len__(self):
+        return len(self.birthdays)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._format(birthday) for birthday in self.birthdays[index]]
+        return self._format(self.birthdays[index])
+
+    @staticmethod
+    def _format(birthday):
+        month, day, member = birthday
+        # The year below is just there to accommodate leap year.  Not used anywhere else.
+        userBirthday = datetime(2020, month, day)
+        return "{0:%B} {0:%d}: {1}".format(userBirthday, member.name)
+
+
 class Birthday:
     """Adds a role to someone on their birthday, and automatically remove them from
     this role after the day is over.
     """
 
     def loadSettings(self):
-        """Loads settings from the JSON file"""
+        """Loads settings from the JSON file, if it changed since it was last read.
+
+        The birthday indices are rebuilt whenever the settings are reloaded.
+        """
+        mtime = os.path.getmtime(SAVE_FOLDER+SAVE_FILE)
+        if mtime == self.settingsMtime:
+            return
         self.settings = dataIO.load_json(SAVE_FOLDER+SAVE_FILE)
+        self.settingsMtime = mtime
+        self.buildIndex()
 
     def saveSettings(self):
-        """Loads settings from the JSON file"""
+        """Saves settings to the JSON file.
+
+        dataIO writes to a temporary file and renames it, so the write is atomic.
+        """
         dataIO.save_json(SAVE_FOLDER+SAVE_FILE, self.settings)
+        self.settingsMtime = os.path.getmtime(SAVE_FOLDER+SAVE_FILE)
 
     # Class constructor
     def __init__(self, bot):
         self.bot = bot
 
         #The JSON keys for the settings:
-        self.settingsLock = Lock()
+        # Only held while settings are changed, never across role API calls.
+        self.settingsLock = asyncio.Lock()
+
+        # Indices so the daily jobs only touch the users they need to:
+        # - calendar: (month, day) -> {server ID: set of user IDs with that birthday}
+        # - assigned: server ID -> set of user IDs currently assigned the role
+        # - userDates: (server ID, user ID) -> (month, day), to unindex a birthday.
+        # - sortedBirthdays: server ID -> sorted list of (month, day, user ID).
+        self.calendar = {}
+        self.assigned = {}
+        self.userDates = {}
+        self.sortedBirthdays = {}
 
         checkFolder()
         checkFiles()
+        # Modification time of the settings file when we last read or wrote it.
+        self.settingsMtime = None
         self.loadSettings()
 
-        # On cog load, we want the loop to run once.
-        self.lastChecked = datetime.now() - timedelta(days=1)
+        # Heap of (epoch time of next local midnight, server ID), so the loop can
+        # sleep until the next server's day rolls over.  self.rollovers holds the
+        # only valid time for each server, stale heap entries are skipped.
+        self.rolloverHeap = []
+        self.rollovers = {}
+        # Set to wake up the loop early when a server's rollover time changes.
+        self.rolloverChanged = asyncio.Event()
+        # On cog load, we want the loop to run once for every server.
+        for sid in self.settings:
+            self.scheduleRollover(sid, time.time())
         self.bgTask = self.bot.loop.create_task(self.birthdayLoop())
 
+    def buildIndex(self):
+        """Build the birthday calendar and assigned user indices from settings."""
+        self.calendar = {}
+        self.assigned = {}
+        self.userDates = {}
+        self.sortedBirthdays = {}
+        for sid, serverSettings in self.settings.items():
+            for userId in serverSettings.get(KEY_BDAY_USERS, {}):
+                self.indexUser(sid, userId)
+
+    def unindexUser(self, sid, userId):
+        """Remove a user from the birthday calendar and assigned user indices.
+
+        Parameters:
+        -----------
+        sid: str
+            The server ID.
+        userId: str
+            The user ID.
+        """
+        date = self.userDates.pop((sid, userId), None)
+        if date:
+            serverUsers = self.calendar[date][sid]
+            serverUsers.discard(userId)
+            if not serverUsers:
+                del self.calendar[date][sid]
+            serverBirthdays = self.sortedBirthdays[sid]
+            del serverBirthdays[bisect.bisect_left(serverBirthdays, date + (userId,))]
+        if sid in self.assigned:
+            self.assigned[sid].discard(userId)
+
+    def indexUser(self, sid, userId):
+        """Update the birthday calendar and assigned user indices for a user.
+
+        This should be called whenever a user's birthday or assignment changes.
+
+        Parameters:
+        -----------
+        sid: str
+            The server ID.
+        userId: str
+            The user ID.
+        """
+        self.unindexUser(sid, userId)
+        try:
+            userDetails = self.settings[sid][KEY_BDAY_USERS][userId]
+        except KeyError:
+            return
+
+        month = userDetails.get(KEY_BDAY_MONTH)
+        day = userDetails.get(KEY_BDAY_DAY)
+        if month is not None and day is not None:
+            self.calendar.setdefault((month, day), {}).setdefault(sid, set()).add(userId)
+            self.userDates[(sid, userId)] = (month, day)
+            bisect.insort(self.sortedBirthdays.setdefault(sid, []), (month, day, userId))
+        if userDetails.get(KEY_IS_ASSIGNED):
+            self.assigned.setdefault(sid, set()).add(userId)
+
+    def getTimezone(self, sid):
+        """Get the timezone of a server.
+
+        Parameters:
+        -----------
+        sid: str
+            The server ID.
+
+        Returns:
+        --------
+        tz: pytz.timezone
+            The server's timezone, or None to use the bot's local time.
+        """
+        tzName = self.settings.get(sid, {}).get(KEY_TIMEZONE)
+        return pytz.timezone(tzName) if tzName else None
+
+    def localNow(self, sid):
+        """Get the current time in a server's timezone.
+
+        Parameters:
+        -----------
+        sid: str
+            The server ID.
+
+        Returns:
+        --------
+        now: datetime.datetime
+            The current time.  This is naive if the server uses the bot's local time.
+        """
+        return datetime.now(self.getTimezone(sid))
+
+    def localDate(self, sid):
+        """Get today's (month, day) in a server's timezone.
+
+        Parameters:
+        -----------
+        sid: str
+            The server ID.
+        """
+        now = self.localNow(sid)
+        return now.month, now.day
+
+    def scheduleRollover(self, sid, when=None):
+        """Schedule the birthday check of a server.
+
+        Parameters:
+        -----------
+        sid: str
+            The server ID.
+        when: float
+            The epoch time to check the server at.  Defaults to the server's next
+            local midnight.
+        """
+        if when is None:
+            tz = self.getTimezone(sid)
+            now = self.localNow(sid)
+            midnight = datetime(now.year, now.month, now.day) + timedelta(days=1)
+            if tz:
+                midnight = tz.localize(midnight)
+            when = midnight.timestamp()
+        self.rollovers[sid] = when
+        heapq.heappush(self.rolloverHeap, (when, sid))
+        self.rolloverChanged.set()
+
+    def _popDueServers(self):
+        """Remove and return the IDs of servers whose rollover time has passed."""
+        now = time.time()
+        due = []
+        while self.rolloverHeap and self.rolloverHeap[0][0] <= now:
+            when, sid = heapq.heappop(self.rolloverHeap)
+            if self.rollovers.get(sid) != when:
+                # Stale entry, the server was rescheduled.
+                continue
+            del self.rollovers[sid]
+            due.append(sid)
+        return due
+
     # Cancel the background task on cog unload.
     def __unload(self): # pylint: disable=invalid-name
         self.bgTask.cancel()
@@ -99,19 +306,68 @@ class Birthday:
                            "as the birthday role!".format(role.name))
 
         # Acquire lock and save settings to file.
-        self.settingsLock.acquire()
+        await self.settingsLock.acquire()
         try:
             self.loadSettings()
             if ctx.message.server.id not in self.settings:
                 self.settings[ctx.message.server.id] = {}
             self.settings[ctx.message.server.id][KEY_BDAY_ROLE] = role.id
             self.saveSettings()
+            if ctx.message.server.id not in self.rollovers:
+                self.scheduleRollover(ctx.message.server.id, time.time())
         except Exception as error: # pylint: disable=broad-except
             LOGGER.error(error)
         finally:
             self.settingsLock.release()
         return
 
+    @_birthday.command(name="timezone", pass_context=True, no_pm=True, aliases=["tz"])
+    @checks.mod_or_permissions(administrator=True)
+    async def _birthdayTimezone(self, ctx, timezone: str = None):
+        """Set the timezone used to decide when a birthday starts and ends.
+
+        Parameters:
+        -----------
+        timezone: str (optional)
+            A timezone name from the tz database, e.g. America/Vancouver.  If not
+            specified, the bot's local time is used.
+        """
+        sid = ctx.message.server.id
+        if sid not in self.settings:
+            await self.bot.say(":negative_squared_cross_mark: **Birthday - Timezone**: "
+                               "This server is not configured, please set a role!")
+            return
+        if timezone:
+            try:
+                timezone = pytz.timezone(timezone).zone
+            except pytz.UnknownTimeZoneError:
+                await self.bot.say(":negative_squared_cross_mark: **Birthday - "
+                                   "Timezone**: Unknown timezone, please use a name "
+                                   "like `America/Vancouver`.")
+                return
+
+        await self.settingsLock.acquire()
+        try:
+            self.loadSettings()
+            self.settings[sid][KEY_TIMEZONE] = timezone
+            self.saveSettings()
+            # Check the server's birthdays again now that its date may have changed.
+            self.scheduleRollover(sid, time.time())
+        except Exception as error: # pylint: disable=broad-except
+            LOGGER.error(error)
+        finally:
+            self.settingsLock.release()
+
+        await self.bot.say(":white_check_mark: **Birthday - Timezone**: Birthdays will "
+                           "use the timezone **{}**.".format(timezone or "of the bot"))
+        LOGGER.info("%s#%s (%s) set the birthday timezone of %s (%s) to %s",
+                    ctx.message.author.name,
+                    ctx.message.author.discriminator,
+                    ctx.message.author.id,
+                    ctx.message.server.name,
+                    sid,
+                    timezone)
+
     @_birthday.command(name="add", pass_context=True, no_pm=True)
     @checks.mod_or_permissions(administrator=True)
     async def _birthdayAdd(self, ctx, user: discord.Member):
@@ -151,7 +407,7 @@ class Birthday:
             return
 
         # Save settings
-        self.settingsLock.acquire()
+        await self.settingsLock.acquire()
         try:
             self.loadSettings()
 
@@ -164,10 +420,11 @@ class Birthday:
             userConfig = self.settings[sid][KEY_BDAY_USERS][user.id]
 
             userConfig[KEY_IS_ASSIGNED] = True
-            userConfig[KEY_DATE_SET_MONTH] = int(time.strftime("%m"))
-            userConfig[KEY_DATE_SET_DAY] = int(time.strftime("%d"))
+            userConfig[KEY_DATE_SET_MONTH], userConfig[KEY_DATE_SET_DAY] = \
+                self.localDate(sid)
 
             self.settings[sid][KEY_BDAY_USERS][user.id] = userConfig
+            self.indexUser(sid, user.id)
 
             self.saveSettings()
         except Exception as error: # pylint: disable=broad-except
@@ -232,7 +489,7 @@ class Birthday:
             return
 
         # Save settings
-        self.settingsLock.acquire()
+        await self.settingsLock.acquire()
         try:
             self.loadSettings()
             sid = ctx.message.server.id
@@ -244,6 +501,7 @@ class Birthday:
                 self.settings[sid][KEY_BDAY_USERS][forUser.id] = {}
             self.settings[sid][KEY_BDAY_USERS][forUser.id][KEY_BDAY_MONTH] = month
             self.settings[sid][KEY_BDAY_USERS][forUser.id][KEY_BDAY_DAY] = day
+            self.indexUser(sid, forUser.id)
 
             self.saveSettings()
         except Exception as error: # pylint: disable=broad-except
@@ -261,7 +519,7 @@ class Birthday:
 
         # Explicitly check to see if user should be added to role, if the month
         # and day just so happen to be the same as it is now.
-        await self.checkBirthday()
+        await self.checkMemberBirthday(forUser)
 
         await asyncio.sleep(5) # pylint: disable=no-member
 
@@ -284,41 +542,22 @@ class Birthday:
     @checks.mod_or_permissions(administrator=True)
     async def _birthdayList(self, ctx):
         """Lists the birthdays of users."""
-        serverID = ctx.message.server.id
         serverName = ctx.message.server.name
-        user = ctx.message.author
-
-        sortedList = [] # List to sort by month, day.
-        display = [] # List of text for paginator to use.  Will be constructed from sortedList.
-
-        # Add only the users we care about (e.g. the ones that have birthdays set).
-        for user, items in self.settings[serverID][KEY_BDAY_USERS].items():
-            # Check if the birthdate keys exist, and they are not null.
-            # If true, add an ID key and append to list.
-            if KEY_BDAY_DAY in items.keys() and \
-                    KEY_BDAY_MONTH in items.keys() and \
-                    KEY_BDAY_DAY is not None and \
-                    KEY_BDAY_MONTH is not None:
-                items["ID"] = user
-                sortedList.append(items)
-
-        # Sort by month, day.
-        sortedList.sort(key=lambda x: (x[KEY_BDAY_MONTH], x[KEY_BDAY_DAY]))
-
-        for user in sortedList:
-            # Get the associated user Discord object.
-            userObject = discord.utils.get(ctx.message.server.members, id=user["ID"])
-
-            # Skip if user is no longer in server.
-            if userObject is None:
-                continue
 
-            # The year below is just there to accommodate leap year.  Not used anywhere else.
-            userBirthday = datetime(2020, user[KEY_BDAY_MONTH], user[KEY_BDAY_DAY])
-            text = "{0:%B} {0:%d}: {1}".format(userBirthday, userObject.name)
-            display.append(text)
+        # The list is already sorted by month, day.  Skip users that are no longer in
+        # the server.
+        birthdays = []
+        for month, day, userId in self.sortedBirthdays.get(ctx.message.server.id, []):
+            userObject = ctx.message.server.get_member(userId)
+            if userObject:
+                birthdays.append((month, day, userObject))
+
+        if not birthdays:
+            await self.bot.say(":negative_squared_cross_mark: **Birthday - List**: "
+                               "There are no birthdays set on this server!")
+            return
 
-        page = Pages(self.bot, message=ctx.message, entries=display)
+        page = Pages(self.bot, message=ctx.message, entries=BirthdayEntries(birthdays))
         page.embed.title = "Birthdays in **{}**".format(serverName)
         page.embed.colour = discord.Colour.red()
         await page.paginate()
@@ -365,12 +604,13 @@ class Birthday:
                                "have enough permissions to do so!".format(user.name))
             return
 
-        self.settingsLock.acquire()
+        await self.settingsLock.acquire()
         try:
             self.loadSettings()
             self.settings[sid][KEY_BDAY_USERS][user.id][KEY_IS_ASSIGNED] = False
             self.settings[sid][KEY_BDAY_USERS][user.id][KEY_DATE_SET_MONTH] = None
             self.settings[sid][KEY_BDAY_USERS][user.id][KEY_DATE_SET_DAY] = None
+            self.indexUser(sid, user.id)
 
             self.saveSettings()
         except Exception as error: # pylint: disable=broad-except
@@ -396,62 +636,252 @@ class Birthday:
     ########################################
     # Event loop - Try an absolute timeout #
     ########################################
-    async def checkBirthday(self, *args): # ignore args pylint: disable=unused-argument
-        """Check birthday list once."""
-        await self._dailySweep()
-        await self._dailyAdd()
+    async def checkMemberBirthday(self, member):
+        """Check the birthday role of a single member, e.g. when they join a server.
+
+        The role is added if today is their birthday, and removed if it was assigned
+        on a previous day.  Otherwise, this returns without doing anything.
+
+        Parameters:
+        -----------
+        member: discord.Member
+            The member to check.
+        """
+        sid = member.server.id
+        try:
+            userDetails = self.settings[sid][KEY_BDAY_USERS][member.id]
+            roleId = self.settings[sid][KEY_BDAY_ROLE]
+        except KeyError:
+            # Server not configured, or member has no birthday settings.
+            return
+
+        month, day = self.localDate(sid)
+        isAssigned = userDetails.get(KEY_IS_ASSIGNED, False)
+        isBirthday = userDetails.get(KEY_BDAY_MONTH) == month and \
+                     userDetails.get(KEY_BDAY_DAY) == day
+        assignedToday = isAssigned and \
+                        userDetails.get(KEY_DATE_SET_MONTH) == month and \
+                        userDetails.get(KEY_DATE_SET_DAY) == day
+        if assignedToday or (not isBirthday and not isAssigned):
+            return
+
+        roleObject = discord.utils.get(member.server.roles, id=roleId)
+        if not roleObject:
+            # The birthday role was deleted.
+            return
+        if not await self._changeRole(member, roleObject, add=isBirthday):
+            return
+
+        await self.settingsLock.acquire()
+        try:
+            userDetails = self.settings[sid][KEY_BDAY_USERS][member.id]
+            userDetails[KEY_IS_ASSIGNED] = isBirthday
+            if isBirthday:
+                userDetails[KEY_DATE_SET_MONTH] = month
+                userDetails[KEY_DATE_SET_DAY] = day
+            self.indexUser(sid, member.id)
+            self.saveSettings()
+        except KeyError:
+            # User was removed from the list while the role was being changed.
+            pass
+        finally:
+            self.settingsLock.release()
 
     async def birthdayLoop(self):
-        """The main event loop that will call the add and sweep methods"""
+        """The main event loop that will call the add and sweep methods.
+
+        The loop sleeps until the earliest server's local midnight, and then only
+        checks the servers whose day rolled over.
+        """
         while self == self.bot.get_cog("Birthday"):
-            if self.lastChecked.day != datetime.now().day:
-                self.lastChecked = datetime.now()
-                await self.checkBirthday()
-            await asyncio.sleep(60) # pylint: disable=no-member
+            sids = self._popDueServers()
+            if sids:
+                try:
+                    await self._dailySweep(sids)
+                    await self._dailyAdd(sids)
+                except asyncio.CancelledError: # pylint: disable=try-except-raise
+                    raise
+                except Exception as error: # pylint: disable=broad-except
+                    LOGGER.error("Error in the daily birthday check: %s", error)
+                # Reschedule each server on its own, so one bad timezone does not
+                # stop the others from being checked.
+                for sid in sids:
+                    try:
+                        self.scheduleRollover(sid)
+                    except Exception as error: # pylint: disable=broad-except
+                        LOGGER.error("Could not schedule birthday check for server "
+                                     "%s: %s", sid, error)
+
+            self.rolloverChanged.clear()
+            sleepTime = MAX_SLEEP
+            if self.rolloverHeap:
+                sleepTime = min(max(self.rolloverHeap[0][0] - time.time(), 0), MAX_SLEEP)
+            try:
+                await asyncio.wait_for(self.rolloverChanged.wait(), sleepTime)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _changeRole(self, member, role, add):
+        """Add or remove a role, retrying when rate limited or on Discord errors.
 
-    async def _dailySweep(self):
-        self.settingsLock.acquire()
+        Parameters:
+        -----------
+        member: discord.Member
+            The member to change the role of.
+        role: discord.Role
+            The birthday role.
+        add: bool
+            True to add the role, False to remove it.
+
+        Returns:
+        --------
+        success: bool
+            True if the role was changed.
+        """
+        action = "add role to" if add else "remove role from"
+        for attempt in range(ROLE_RETRIES):
+            try:
+                if add:
+                    await self.bot.add_roles(member, role)
+                else:
+                    await self.bot.remove_roles(member, role)
+                LOGGER.info("%s birthday role %s %s#%s (%s)",
+                            "Added" if add else "Removed", "to" if add else "from",
+                            member.name, member.discriminator, member.id)
+                return True
+            except discord.errors.Forbidden as error:
+                LOGGER.error("Could not %s %s#%s (%s)!", action,
+                             member.name, member.discriminator, member.id)
+                LOGGER.error(error)
+                return False
+            except discord.errors.HTTPException as error:
+                status = getattr(error.response, "status", 0)
+                if status != 429 and status < 500:
+                    LOGGER.error("Could not %s %s#%s (%s)!", action,
+                                 member.name, member.discriminator, member.id)
+                    LOGGER.error(error)
+                    return False
+                delay = ROLE_BACKOFF * 2 ** attempt
+                LOGGER.warning("Got status %s trying to %s %s (%s), retrying in %ss "
+                               "(attempt %s/%s)", status, action, member.name,
+                               member.id, delay, attempt + 1, ROLE_RETRIES)
+                await asyncio.sleep(delay) # pylint: disable=no-member
+        LOGGER.error("Gave up trying to %s %s#%s (%s)!", action,
+                     member.name, member.discriminator, member.id)
+        return False
+
+    async def _runRoleChanges(self, changes, add):
+        """Apply birthday role changes, in parallel across servers.
+
+        Changes on the same server are made one at a time, in order.  At most
+        ROLE_WORKERS servers are worked on at once.
+
+        Parameters:
+        -----------
+        changes: {str: (discord.Role, [discord.Member])}
+            Server ID -> the birthday role, and the members to change the role of.
+        add: bool
+            True to add the role, False to remove it.
+
+        Returns:
+        --------
+        succeeded: {str: [str]}
+            Server ID -> the IDs of the members whose role was changed.
+        """
+        total = sum(len(members) for _, members in changes.values())
+        if not total:
+            return {}
+        succeeded = {}
+        progress = {"done": 0}
+        semaphore = asyncio.Semaphore(ROLE_WORKERS)
+        startTime = time.time()
+
+        async def serverWorker(sid, role, members):
+            async with semaphore:
+                for member in members:
+                    try:
+                        if await self._changeRole(member, role, add):
+                            succeeded.setdefault(sid, []).append(member.id)
+                    except Exception as error: # pylint: disable=broad-except
+                        # Count as failed, and carry on with the other members.
+                        LOGGER.error("Could not change birthday role of %s#%s (%s): %s",
+                                     member.name, member.discriminator, member.id,
+                                     error)
+                    progress["done"] += 1
+                    if progress["done"] % ROLE_PROGRESS == 0:
+                        LOGGER.info("Birthday roles: %s/%s changes done",
+                                    progress["done"], total)
+
+        results = await asyncio.gather(*[serverWorker(sid, role, members) for
+                                         sid, (role, members) in changes.items()],
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                LOGGER.error("Birthday role worker failed: %s", result)
+        LOGGER.info("Birthday roles: %s %s/%s users on %s servers in %.1fs",
+                    "added" if add else "removed",
+                    sum(len(userIds) for userIds in succeeded.values()), total,
+                    len(changes), time.time() - startTime)
+        return succeeded
+
+    async def _dailySweep(self, sids):
+        changes = {}
+        await self.settingsLock.acquire()
+        changed = False
         try: # pylint: disable=too-many-nested-blocks
-            # Check each server.
-            for sid in self.settings:
-                # Check to see if any users need to be removed.
-                for userId, userDetails in self.settings[sid][KEY_BDAY_USERS].items():
-                    # If assigned and the date is different than the date assigned, remove role.
+            # Check only the users that are currently assigned the role.
+            for sid in sids:
+                userIds = self.assigned.get(sid)
+                if not userIds:
+                    continue
+                month, day = self.localDate(sid)
+                serverObject = self.bot.get_server(sid)
+                if not serverObject:
+                    continue
+                roleObject = discord.utils.get(serverObject.roles,
+                                               id=self.settings[sid][KEY_BDAY_ROLE])
+                if not roleObject:
+                    # The birthday role was deleted, nothing to change.
+                    continue
+                for userId in list(userIds):
+                    userDetails = self.settings[sid][KEY_BDAY_USERS][userId]
+                    # If the date is different than the date assigned, remove role.
                     try:
-                        if userDetails[KEY_IS_ASSIGNED]:
-                            if userDetails[KEY_DATE_SET_MONTH] != int(time.strftime("%m")) or \
-                                    userDetails[KEY_DATE_SET_DAY] != int(time.strftime("%d")):
-                                serverObject = discord.utils.get(self.bot.servers, id=sid)
-                                roleObject = discord.utils.get(serverObject.roles,
-                                                               id=self.settings[sid][KEY_BDAY_ROLE])
-                                userObject = discord.utils.get(serverObject.members, id=userId)
-
-                                if userObject:
-                                    # Remove the role
-                                    try:
-                                        await self.bot.remove_roles(userObject, roleObject)
-                                        LOGGER.info("Removed role from %s#%s (%s)",
-                                                    userObject.name,
-                                                    userObject.discriminator,
-                                                    userObject.id)
-                                    except discord.errors.Forbidden as error:
-                                        LOGGER.error("Could not remove role from %s#%s (%s)!",
-                                                     userObject.name,
-                                                     userObject.discriminator,
-                                                     userObject.id)
-                                        LOGGER.error(error)
-                                else:
-                                    # Do not remove role, wait until user rejoins, in case
-                                    # another cog saves roles.
-                                    continue
-
-                                # Update the list.
-                                self.settings[sid][KEY_BDAY_USERS][userId][KEY_IS_ASSIGNED] = False
-                                self.saveSettings()
+                        if userDetails[KEY_DATE_SET_MONTH] != month or \
+                                userDetails[KEY_DATE_SET_DAY] != day:
+                            userObject = serverObject.get_member(userId)
+
+                            if userObject:
+                                changes.setdefault(sid, (roleObject, []))[1].append(userObject)
+                            # Otherwise, do not remove role, wait until user rejoins,
+                            # in case another cog saves roles.
                     except KeyError as error:
                         LOGGER.error(error)
-                        self.settings[sid][KEY_BDAY_USERS][userId][KEY_IS_ASSIGNED] = False
-                        self.saveSettings()
+                        userDetails[KEY_IS_ASSIGNED] = False
+                        self.indexUser(sid, userId)
+                        changed = True
+        except Exception as error: # pylint: disable=broad-except
+            LOGGER.error("Broad exception: %s", error)
+        finally:
+            if changed:
+                self.saveSettings()
+            self.settingsLock.release()
+
+        # Remove the roles without holding the lock, so commands are not blocked.
+        await self._runRoleChanges(changes, add=False)
+
+        await self.settingsLock.acquire()
+        try:
+            # Update the list, even if the role could not be removed.
+            for sid, (_, members) in changes.items():
+                serverUsers = self.settings.get(sid, {}).get(KEY_BDAY_USERS, {})
+                for userObject in members:
+                    if userObject.id in serverUsers:
+                        serverUsers[userObject.id][KEY_IS_ASSIGNED] = False
+                        self.indexUser(sid, userObject.id)
+            # Save all of the changes from this sweep at once.
+            if changes:
+                self.saveSettings()
         except Exception as error: # pylint: disable=broad-except
             LOGGER.error("Broad exception: %s", error)
         finally:
@@ -460,85 +890,57 @@ class Birthday:
     ##################################################################
     # Event Loop - Check to see if we need to add people to the role #
     ##################################################################
-    async def _dailyAdd(self): # pylint: disable=too-many-branches
-        self.settingsLock.acquire()
+    async def _dailyAdd(self, sids):
+        changes = {}
+        await self.settingsLock.acquire()
         try: # pylint: disable=too-many-nested-blocks
-            # Check each server.
-            for sid in self.settings:
-                # Check to see if any users need to be removed.
-                for userId, userDetails in self.settings[sid][KEY_BDAY_USERS].items():
-                    # If today is the user's birthday, and the role is not assigned,
-                    # assign the role.
-
-                    # Check if the keys for birthdate day and month exist, and that
-                    # they're not null.
-                    if KEY_BDAY_DAY in userDetails.keys() and \
-                            KEY_BDAY_MONTH in userDetails.keys() and \
-                            userDetails[KEY_BDAY_DAY] is not None and \
-                            userDetails[KEY_BDAY_MONTH] is not None:
-                        birthdayDay = userDetails[KEY_BDAY_DAY]
-                        birthdayMonth = userDetails[KEY_BDAY_MONTH]
-
-                        if birthdayMonth == int(time.strftime("%m")) and \
-                                birthdayDay == int(time.strftime("%d")):
-                            # Get the necessary Discord objects.
-                            serverObject = discord.utils.get(self.bot.servers,
-                                                             id=sid)
-                            roleObject = discord.utils.get(serverObject.roles,
-                                                           id=self.settings[sid][KEY_BDAY_ROLE])
-                            userObject = discord.utils.get(serverObject.members,
-                                                           id=userId)
-
-                            # Skip if user is no longer in server.
-                            if not userObject:
-                                continue
-
-                            try:
-                                if not userDetails[KEY_IS_ASSIGNED] and userObject is not None:
-                                    try:
-                                        await self.bot.add_roles(userObject, roleObject)
-                                        LOGGER.info("Added birthday role to %s#%s (%s)",
-                                                    userObject.name,
-                                                    userObject.discriminator,
-                                                    userObject.id)
-                                        # Update the list.
-                                        userDetails[KEY_IS_ASSIGNED] = True
-                                        userDetails[KEY_DATE_SET_MONTH] = int(time.strftime("%m"))
-                                        userDetails[KEY_DATE_SET_DAY] = int(time.strftime("%d"))
-                                        self.settings[sid][KEY_BDAY_USERS][userId] = userDetails
-                                        self.saveSettings()
-                                    except discord.errors.Forbidden as error:
-                                        LOGGER.error("Could not add role to %s#%s (%s)",
-                                                     userObject.name,
-                                                     userObject.discriminator,
-                                                     userObject.id)
-                                        LOGGER.error(error)
-                            except Exception: # pylint: disable=broad-except
-                                # This key error will happen if the isAssigned key does not exist.
-                                if userObject is not None:
-                                    try:
-                                        await self.bot.add_roles(userObject, roleObject)
-                                        LOGGER.info("Added birthday role to %s#%s (%s)",
-                                                    userObject.name,
-                                                    userObject.discriminator,
-                                                    userObject.id)
-                                        # Update the list.
-                                        userDetails[KEY_IS_ASSIGNED] = True
-                                        userDetails[KEY_DATE_SET_MONTH] = int(time.strftime("%m"))
-                                        userDetails[KEY_DATE_SET_DAY] = int(time.strftime("%d"))
-                                        self.settings[sid][KEY_BDAY_USERS][userId] = userDetails
-                                        self.saveSettings()
-                                    except discord.errors.Forbidden as error:
-                                        LOGGER.error("Could not add role to %s#%s (%s)",
-                                                     userObject.name,
-                                                     userObject.discriminator,
-                                                     userObject.id)
-                                        LOGGER.error(error)
-                            # End try/except block for isAssigned key.
-                        # End if to check if today is the user's birthday.
-                    # End if to check for birthdateMonth and birthdateDay keys.
-                # End user loop.
-            # End server loop.
+            # Check only the users whose birthday is today, in the server's timezone.
+            for sid in sids:
+                userIds = self.calendar.get(self.localDate(sid), {}).get(sid)
+                if not userIds:
+                    continue
+                serverObject = self.bot.get_server(sid)
+                if not serverObject:
+                    continue
+                roleObject = discord.utils.get(serverObject.roles,
+                                               id=self.settings[sid][KEY_BDAY_ROLE])
+                if not roleObject:
+                    # The birthday role was deleted, nothing to change.
+                    continue
+                for userId in list(userIds):
+                    userDetails = self.settings[sid][KEY_BDAY_USERS][userId]
+                    userObject = serverObject.get_member(userId)
+
+                    # Skip if user is no longer in server, or already has the role.
+                    # The isAssigned key may not exist.
+                    if not userObject or userDetails.get(KEY_IS_ASSIGNED):
+                        continue
+                    changes.setdefault(sid, (roleObject, []))[1].append(userObject)
+        except Exception as error: # pylint: disable=broad-except
+            LOGGER.error(error)
+        finally:
+            self.settingsLock.release()
+
+        # Add the roles without holding the lock, so commands are not blocked.
+        succeeded = await self._runRoleChanges(changes, add=True)
+
+        await self.settingsLock.acquire()
+        try:
+            # Update the list.
+            for sid, userIds in succeeded.items():
+                month, day = self.localDate(sid)
+                serverUsers = self.settings.get(sid, {}).get(KEY_BDAY_USERS, {})
+                for userId in userIds:
+                    if userId not in serverUsers:
+                        continue
+                    userDetails = serverUsers[userId]
+                    userDetails[KEY_IS_ASSIGNED] = True
+                    userDetails[KEY_DATE_SET_MONTH] = month
+                    userDetails[KEY_DATE_SET_DAY] = day
+                    self.indexUser(sid, userId)
+            # Save all of the changes from this run at once.
+            if succeeded:
+                self.saveSettings()
         except Exception as error: # pylint: disable=broad-except
             LOGGER.error(error)
         finally:
@@ -560,5 +962,5 @@ def setup(bot):
         handler.setFormatter(logging.Formatter("%(asctime)s %(message)s",
                                                datefmt="[%d/%m/%Y %H:%M:%S]"))
         LOGGER.addHandler(handler)
-    bot.add_listener(customCog.checkBirthday, "on_member_join")
+    bot.add_listener(customCog.checkMemberBirthday, "on_member_join")
     bot.add_cog(customCog)
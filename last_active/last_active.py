@@ -2,23 +2,29 @@
 See when the last time someone spoke in a channel.
 """
 
+from array import array
+import asyncio
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
+import json
 from threading import Lock
 import logging
 import os
+import time
 from pprint import pprint
 import discord
 from discord.ext import commands
-from .utils import config
 
 KEY_CH_SPECIFIC = "channelSpecific"
-KEY_SERVER_SPECIFIC = "serverSpecific"
-KEY_GLOBAL = "global"
 
 LOGGER = None
 
 SAVE_FOLDER = "data/lui-cogs/lastactive/" # Path to save folder.
-SAVE_FILE = "settings.json"
+SNAPSHOT_FILE = SAVE_FOLDER + "snapshot.json" # All channel specific data, compacted.
+DELTA_FILE = SAVE_FOLDER + "delta.log" # Changes since the snapshot, one per line.
+FLUSH_INTERVAL = 60 # Time in seconds between writes of changes to the delta log.
+COMPACT_ENTRIES = 100000 # Delta log entries after which a new snapshot is written.
 
 def checkFolder():
     """Used to create the data folder at first startup"""
@@ -26,18 +32,85 @@ def checkFolder():
         print("Creating " + SAVE_FOLDER + " folder...")
         os.makedirs(SAVE_FOLDER)
 
+class ChannelActivity:
+    """When each user was last active in a channel.
+
+    User IDs and epoch second timestamps are kept in two arrays sorted by user ID,
+    which takes 12 bytes per user instead of a dict entry with an ID string and a
+    datetime.
+    """
+
+    __slots__ = ("userIDs", "times")
+
+    def __init__(self, userIDs=(), times=()):
+        """
+        Parameters:
+        -----------
+        userIDs: iterable of int
+            The user IDs, sorted.
+        times: iterable of int
+            The last active time of each user, in epoch seconds.
+        """
+        self.userIDs = array("Q", userIDs)
+        self.times = array("I", times)
+
+    def __len__(self):
+        return len(self.userIDs)
+
+    def __repr__(self):
+        return repr(dict(zip(self.userIDs, self.times)))
+
+    def get(self, uid):
+        """Get when a user was last active in epoch seconds, or None."""
+        index = bisect_left(self.userIDs, uid)
+        if index < len(self.userIDs) and self.userIDs[index] == uid:
+            return self.times[index]
+        return None
+
+    def update(self, uid, timestamp):
+        """Set when a user was last active, unless a later time is already known."""
+        index = bisect_left(self.userIDs, uid)
+        if index < len(self.userIDs) and self.userIDs[index] == uid:
+            if self.times[index] < timestamp:
+                self.times[index] = timestamp
+        else:
+            self.userIDs.insert(index, uid)
+            self.times.insert(index, timestamp)
+
 class LastActive: # pylint: disable=too-few-public-methods
     """Let's see when people were last active."""
 
     # Class constructor
     def __init__(self, bot):
         self.bot = bot
-        self.config = config.Config("settings.json",
-                                    cogname="lui-cogs/last_active")
-        self.chSpecific = self.config.get(KEY_CH_SPECIFIC, {})
-        self.serverSpecific = self.config.get(KEY_SERVER_SPECIFIC, {})
-        self.userGlobal = self.config.get(KEY_GLOBAL, {})
+        # Server ID -> channel ID -> ChannelActivity.  Server and global last active
+        # times are derived from this when asked for.
+        self.chSpecific = {}
+        # (sid, cid, uid) -> epoch seconds, changes not yet written to the delta log.
+        self.dirty = {}
+        self.deltaEntries = 0 # Entries in the delta log.
+        self.compacting = False
         self.lock = Lock()
+        # Held while writing to the delta log or snapshot, from any thread.
+        self.fileLock = Lock()
+        # Writes go through one thread, so they run in the order they were started.
+        self.fileExecutor = ThreadPoolExecutor(max_workers=1)
+        self.compactFuture = None # The snapshot write, while compacting.
+        self._loadFromDisk()
+        self.flushTask = self.bot.loop.create_task(self._flushLoop())
+
+    # Write pending changes on cog unload.
+    def __unload(self): # pylint: disable=invalid-name
+        self.flushTask.cancel()
+        with self.lock:
+            dirty = self._takeDirty()
+        if self.compacting and self.compactFuture:
+            # Wait until the compaction has emptied the delta log, even if it has not
+            # started yet, so these changes are not emptied with it.
+            wait([self.compactFuture])
+        if dirty:
+            self._appendDeltas(dirty)
+        self.fileExecutor.shutdown(wait=False)
 
     @commands.group(name="lastactive", pass_context=True)
     async def lastActive(self, ctx):
@@ -77,23 +150,30 @@ class LastActive: # pylint: disable=too-few-public-methods
             When parameters are missing.
 
         """
+        uid = int(uid)
         if cid:
             if not sid:
                 raise AttributeError
-            try:
-                return self.chSpecific[sid][cid][uid]
-            except KeyError:
-                return None
+            channel = self.chSpecific.get(int(sid), {}).get(int(cid))
+            timestamp = channel.get(uid) if channel else None
         elif sid:
-            try:
-                return self.serverSpecific[sid][uid]
-            except KeyError:
-                return None
+            timestamp = self._latest(uid, self.chSpecific.get(int(sid), {}).values())
         else: # uid
-            try:
-                return self.userGlobal[uid]
-            except KeyError:
-                return None
+            timestamp = self._latest(uid, (channel for channels in self.chSpecific.values()
+                                           for channel in channels.values()))
+        if timestamp is None:
+            return None
+        return datetime.fromtimestamp(timestamp)
+
+    @staticmethod
+    def _latest(uid, channels):
+        """Get the latest time a user was active in any of the channels, or None."""
+        latest = None
+        for channel in channels:
+            timestamp = channel.get(uid)
+            if timestamp is not None and (latest is None or timestamp > latest):
+                latest = timestamp
+        return latest
 
     #############
     # Listeners #
@@ -106,14 +186,13 @@ class LastActive: # pylint: disable=too-few-public-methods
         msg: discord.Message
             The message that triggered this listener.
         """
+        now = int(time.time())
         with self.lock:
-            sid = msg.server.id
-            cid = msg.channel.id
-            uid = msg.author.id
+            sid = int(msg.server.id)
+            cid = int(msg.channel.id)
+            uid = int(msg.author.id)
             LOGGER.debug("Message: sid %s, cid %s, uid %s", sid, cid, uid)
-            self._updateChannelSpecific(uid, sid, cid)
-            self._updateServerSpecific(uid, sid)
-            self._updateGlobal(uid)
+            self._updateChannelSpecific(uid, sid, cid, now)
 
     async def listenReaction(self, reaction, user):
         """Listener for reactions.
@@ -125,16 +204,15 @@ class LastActive: # pylint: disable=too-few-public-methods
         user: discord.Member
             The user that reacted.
         """
+        now = int(time.time())
         with self.lock:
-            sid = reaction.message.server.id
-            cid = reaction.message.channel.id
-            uid = user.id
+            sid = int(reaction.message.server.id)
+            cid = int(reaction.message.channel.id)
+            uid = int(user.id)
             LOGGER.debug("Reaction: sid %s, cid %s, uid %s", sid, cid, uid)
-            self._updateChannelSpecific(uid, sid, cid)
-            self._updateServerSpecific(uid, sid)
-            self._updateGlobal(uid)
+            self._updateChannelSpecific(uid, sid, cid, now)
 
-    def _updateChannelSpecific(self, uid, sid, cid):
+    def _updateChannelSpecific(self, uid, sid, cid, now):
         """Update the last active for a specific user on a specific channel.
 
         Parameters:
@@ -144,55 +222,149 @@ class LastActive: # pylint: disable=too-few-public-methods
         sid: int
             The ID of the server you want to update.
         cid: int
-            The ID of the channel you want to update..
+            The ID of the channel you want to update.
+        now: int
+            The current time, in epoch seconds.
 
         Returns:
         --------
-        None, but updates self.chSpecific.
+        None, but updates self.chSpecific, and marks the change to be written.
         """
-        if sid not in self.chSpecific.keys():
-            self.chSpecific[sid] = {}
-        if cid not in self.chSpecific[sid].keys():
-            self.chSpecific[sid][cid] = {}
+        channels = self.chSpecific.setdefault(sid, {})
+        channel = channels.get(cid)
+        if channel is None:
+            channel = channels[cid] = ChannelActivity()
+        channel.update(uid, now)
+        self.dirty[(sid, cid, uid)] = now
 
-        self.chSpecific[sid][cid][uid] = datetime.now()
+    ###############
+    # Persistence #
+    ###############
+    def _loadFromDisk(self):
+        """Load the snapshot, then replay the delta log on top of it.
 
-    def _updateServerSpecific(self, uid, sid):
-        """Update the last active for a specific user on a specific server.
+        Only the newest time for each user and channel is kept, so replaying a delta
+        log over a newer snapshot is harmless.
+        """
+        snapshot = {}
+        try:
+            with open(SNAPSHOT_FILE, encoding="utf-8") as snapshotFile:
+                snapshot = json.load(snapshotFile)
+        except FileNotFoundError:
+            pass
+        except ValueError as error:
+            LOGGER.error("Could not read last active snapshot: %s", error)
+        for sid, channels in snapshot.get(KEY_CH_SPECIFIC, {}).items():
+            self.chSpecific[int(sid)] = {int(cid): ChannelActivity(userIDs, times)
+                                         for cid, (userIDs, times) in channels.items()}
 
-        Parameters:
-        -----------
-        uid: int
-            The ID of the user you want to update.
-        sid: int
-            The ID of the server you want to update.
+        if not os.path.exists(DELTA_FILE):
+            return
+        with open(DELTA_FILE, encoding="utf-8") as deltaFile:
+            for line in deltaFile:
+                try:
+                    sid, cid, uid, timestamp = json.loads(line)
+                except ValueError:
+                    # Partly written line from a crash.
+                    LOGGER.error("Skipping bad delta log entry: %s", line.strip())
+                    continue
+                channels = self.chSpecific.setdefault(sid, {})
+                if cid not in channels:
+                    channels[cid] = ChannelActivity()
+                channels[cid].update(uid, timestamp)
+                self.deltaEntries += 1
+        LOGGER.info("Loaded last active data, replayed %s delta log entries.",
+                    self.deltaEntries)
 
-        Returns:
-        --------
-        None, but updates self.serverSpecific.
-        """
-        if sid not in self.serverSpecific.keys():
-            self.serverSpecific[sid] = {}
+    def _takeDirty(self):
+        """Take the changes since the last flush, leaving none pending."""
+        dirty = self.dirty
+        self.dirty = {}
+        return dirty
 
-        self.serverSpecific[sid][uid] = datetime.now()
+    def _restoreDirty(self, dirty):
+        """Put back changes that could not be written, unless changed since."""
+        for key, timestamp in dirty.items():
+            self.dirty.setdefault(key, timestamp)
 
-    def _updateGlobal(self, uid):
-        """Update the last active for a specific user on ANY server.
+    def _appendDeltas(self, dirty):
+        """Append changes to the delta log.
 
         Parameters:
         -----------
-        uid: int
-            The ID of the user you want to update.
+        dirty: dict
+            (sid, cid, uid) -> epoch seconds, the changes to write.
+        """
+        with self.fileLock, open(DELTA_FILE, "a", encoding="utf-8") as deltaFile:
+            deltaFile.writelines("[{0}, {1}, {2}, {3}]\n".format(sid, cid, uid, timestamp)
+                                 for (sid, cid, uid), timestamp in dirty.items())
 
-        Returns:
-        --------
-        None, but updates self.global.
+    def _writeSnapshot(self, snapshot):
+        """Write a snapshot, then empty the delta log it replaces.
+
+        The snapshot is written without indentation to a temporary file, which then
+        replaces the old snapshot.  If this is interrupted before the delta log is
+        emptied, the old delta log is replayed over the new snapshot.  This is
+        harmless, since only newer times are kept on load.
         """
-        self.userGlobal[uid] = datetime.now()
+        tempFile = SNAPSHOT_FILE + ".tmp"
+        with self.fileLock:
+            with open(tempFile, "w", encoding="utf-8") as snapshotFile:
+                json.dump(snapshot, snapshotFile, separators=(",", ":"))
+            os.replace(tempFile, SNAPSHOT_FILE)
+            open(DELTA_FILE, "w").close()
 
     async def flushToDisk(self):
-        """Flush last active data to the disk."""
-        pass
+        """Flush last active data to the disk.
+
+        Only the changes since the last flush are appended to the delta log, so
+        the cost of this depends on recent activity, not on all stored data.  Once
+        the delta log has COMPACT_ENTRIES entries, a new snapshot is written
+        instead, in the background.
+        """
+        if self.compacting:
+            # Leave the changes for the next flush.
+            return
+        with self.lock:
+            dirty = self._takeDirty()
+            if not dirty:
+                return
+            snapshot = None
+            if self.deltaEntries + len(dirty) >= COMPACT_ENTRIES:
+                # Copy on the event loop so the data does not change while the
+                # snapshot is being written.
+                snapshot = {KEY_CH_SPECIFIC: {
+                    sid: {cid: [channel.userIDs.tolist(), channel.times.tolist()]
+                          for cid, channel in channels.items()}
+                    for sid, channels in self.chSpecific.items()}}
+
+        try:
+            if snapshot is None:
+                await self.bot.loop.run_in_executor(self.fileExecutor, self._appendDeltas,
+                                                    dirty)
+                self.deltaEntries += len(dirty)
+                return
+            self.compacting = True
+            self.compactFuture = self.fileExecutor.submit(self._writeSnapshot, snapshot)
+            try:
+                await asyncio.wrap_future(self.compactFuture)
+            finally:
+                self.compacting = False
+                self.compactFuture = None
+            self.deltaEntries = 0
+            LOGGER.info("Compacted last active data into a new snapshot.")
+        except OSError:
+            self._restoreDirty(dirty)
+            raise
+
+    async def _flushLoop(self):
+        """Flush to disk every FLUSH_INTERVAL seconds."""
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await self.flushToDisk()
+            except OSError as error:
+                LOGGER.error("Could not write last active data: %s", error)
 
 def setup(bot):
     """Add the cog to the bot."""
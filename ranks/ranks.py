@@ -2,13 +2,24 @@
 Keep track of active members on the server.
 """
 
+import asyncio
+import bisect
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 import logging
 import os
 import random
-import MySQLdb # The use of MySQL is debatable, but will use it to incorporate CMPT 354 stuff.
+import sqlite3
+import threading
+import time
+try:
+    import MySQLdb # The use of MySQL is debatable, but will use it to incorporate CMPT 354 stuff.
+except ImportError:
+    MySQLdb = None # Only needed by the MySQL backend.
 import discord
 from discord.ext import commands
 from __main__ import send_cmd_help # pylint: disable=no-name-in-module
+from cogs.utils.paginator import Pages # For making pages, requires the util!
 from .utils.dataIO import dataIO # pylint: disable=relative-beyond-top-level
 
 # Requires checks utility from:
@@ -18,6 +29,32 @@ from .utils import checks # pylint: disable=relative-beyond-top-level
 # Global variables
 LOGGER = None
 SAVE_FOLDER = "data/lui-cogs/ranks/" # Path to save folder.
+DB_WORKERS = 2 # Number of threads (and persistent connections) used for queries.
+FLUSH_INTERVAL = 5 # Time in seconds between writes of accumulated XP.
+LOAD_RETRY_INTERVAL = 30 # Time in seconds to wait before retrying to load XP.
+PRUNE_INTERVAL = 300 # Time in seconds between removals of expired cooldowns.
+# XP needed to go from level n to n + 1 is a*n^2 + b*n + c, with (a, b, c) below.
+DEFAULT_LEVEL_CURVE = (5, 50, 100) # Same as Mee6.
+PRECOMPUTED_LEVELS = 200 # Levels to compute when a curve is first used.
+BACKFILL_FILE = SAVE_FOLDER + "backfill.json" # Backfill checkpoints.
+BACKFILL_PAGE = 100 # Messages to fetch per history request, the API maximum.
+BACKFILL_REPORT_INTERVAL = 10 # Time in seconds between backfill progress updates.
+LEADERBOARD_PAGE = 10 # Members per leaderboard page.
+LEADERBOARD_FETCH = 50 # Leaderboard rows to read at a time when building pages.
+NAME_CACHE_TTL = 600 # Time in seconds to cache member display names.
+BACKEND_MYSQL = "mysql"
+BACKEND_SQLITE = "sqlite"
+SQLITE_FILE = SAVE_FOLDER + "ranks.db"
+SQLITE_TIMEOUT = 30 # Time in seconds to wait for a write lock on the SQLite database.
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS xp (
+    guildid INTEGER NOT NULL,
+    userid INTEGER NOT NULL,
+    xp INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guildid, userid)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS xp_guild_xp ON xp (guildid, xp);
+"""
 
 def checkFolder():
     """Used to create the data folder at first startup"""
@@ -34,11 +71,455 @@ def checkFiles():
         print("Creating default ranks settings.json...")
         dataIO.save_json(theFile, base)
 
-    theFile = SAVE_FOLDER + "lastspoke.json"
+    theFile = BACKFILL_FILE
     if not dataIO.is_valid_json(theFile):
-        print("Creating default ranks lastspoke.json...")
+        print("Creating default ranks backfill.json...")
         dataIO.save_json(theFile, base)
 
+class LevelCurve:
+    """The XP needed for each level, with levels looked up by bisecting.
+
+    The XP needed to go from level n to n + 1 is a*n^2 + b*n + c.
+    """
+
+    def __init__(self, a, b, c): # pylint: disable=invalid-name
+        """
+        Parameters:
+        -----------
+        a: int
+            The quadratic coefficient, at least 0.
+        b: int
+            The linear coefficient, at least 0.
+        c: int
+            The XP needed for level 1, at least 1.
+        """
+        self.coefficients = (a, b, c)
+        # thresholds[n] is the total XP needed to reach level n.
+        self.thresholds = [0]
+        self._extend(PRECOMPUTED_LEVELS)
+
+    def _extend(self, levels):
+        """Compute thresholds up to the given level."""
+        a, b, c = self.coefficients # pylint: disable=invalid-name
+        for level in range(len(self.thresholds) - 1, levels):
+            self.thresholds.append(self.thresholds[-1] + a * level ** 2 + b * level + c)
+
+    def getLevel(self, xp):
+        """Get the level of a user from their XP.
+
+        Parameters:
+        -----------
+        xp: int
+            The total XP of the user.
+
+        Returns:
+        --------
+        level: int
+            The level of the user.
+        levelXP: int
+            The XP needed to go from this level to the next.
+        totalXP: int
+            The total XP needed to reach this level.
+        """
+        while xp >= self.thresholds[-1]:
+            self._extend(2 * len(self.thresholds))
+        level = bisect.bisect_right(self.thresholds, xp) - 1
+        totalXP = self.thresholds[level]
+        return level, self.thresholds[level + 1] - totalXP, totalXP
+
+class MySQLStorage:
+    """Stores XP in the renbot.xp table on a MySQL server."""
+
+    def __init__(self, settings):
+        """
+        Parameters:
+        -----------
+        settings: dict
+            The cog settings, with the MySQL host, username and password.
+        """
+        if MySQLdb is None:
+            raise RuntimeError("The MySQL backend for ranks requires MySQLdb.")
+        self.settings = settings
+        self.error = MySQLdb.Error
+        # The server may close idle connections.
+        self.disconnectError = MySQLdb.OperationalError
+
+    def connect(self):
+        """Open a new connection."""
+        return MySQLdb.connect(host=self.settings["mysql_host"],
+                               user=self.settings["mysql_username"],
+                               passwd=self.settings["mysql_password"])
+
+    def allXP(self, connection): # pylint: disable=no-self-use
+        """Get the guild ID, user ID and XP of every user."""
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT guildid, userid, xp FROM renbot.xp")
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def addPoints(self, connection, rows): # pylint: disable=no-self-use
+        """Add XP to users in one batched statement.
+
+        Parameters:
+        -----------
+        connection: MySQLdb.connections.Connection
+            The database connection.
+        rows: list
+            (userID, guildID, xp) tuples with the XP to add.
+        """
+        cursor = connection.cursor()
+        try:
+            # executemany sends this as a single multi-row INSERT.
+            cursor.executemany("INSERT INTO renbot.xp (userid, guildid, xp) VALUES "
+                               "(%s, %s, %s) ON DUPLICATE KEY UPDATE "
+                               "xp = xp + VALUES(xp)", rows)
+            connection.commit()
+        finally:
+            cursor.close()
+
+class SQLiteStorage:
+    """Stores XP in a local SQLite database, in WAL mode.
+
+    No server is needed, so this suits small deployments and offline testing.
+    """
+
+    def __init__(self, path):
+        """
+        Parameters:
+        -----------
+        path: str
+            The path of the database file.
+        """
+        self.path = path
+        self.error = sqlite3.Error
+        self.disconnectError = () # Local connections do not drop.
+
+    def connect(self):
+        """Open a new connection, creating the tables if needed."""
+        # Each connection is only used by one pool thread, but is closed from
+        # another one when the pool shuts down.
+        connection = sqlite3.connect(self.path, timeout=SQLITE_TIMEOUT,
+                                     check_same_thread=False)
+        # WAL lets readers run while XP is being written.
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SQLITE_SCHEMA)
+        return connection
+
+    def allXP(self, connection): # pylint: disable=no-self-use
+        """Get the guild ID, user ID and XP of every user."""
+        return connection.execute("SELECT guildid, userid, xp FROM xp").fetchall()
+
+    def addPoints(self, connection, rows): # pylint: disable=no-self-use
+        """Add XP to users in one transaction.
+
+        Parameters:
+        -----------
+        connection: sqlite3.Connection
+            The database connection.
+        rows: list
+            (userID, guildID, xp) tuples with the XP to add.
+        """
+        keys = [(int(guildID), int(userID)) for userID, guildID, _ in rows]
+        # Upserts need SQLite 3.24, which older Python builds do not have, so
+        # create missing rows first and then add to them.
+        with connection:
+            connection.executemany("INSERT OR IGNORE INTO xp (guildid, userid, xp) "
+                                   "VALUES (?, ?, 0)", keys)
+            connection.executemany("UPDATE xp SET xp = xp + ? WHERE guildid = ? AND "
+                                   "userid = ?",
+                                   [(xp,) + key for key, (_, _, xp) in zip(keys, rows)])
+
+class Cooldowns:
+    """When each user last earned XP, so they cannot earn it again too soon.
+
+    Entries whose cooldown has passed are removed by prune, so only recently
+    active users are kept.
+    """
+
+    def __init__(self):
+        # (guild ID, user ID) -> timestamp of the message that last earned XP.
+        self.lastEarned = {}
+
+    def check(self, key, timestamp, cooldown):
+        """Check whether a user can earn XP, and if so, start their cooldown.
+
+        Parameters:
+        -----------
+        key: tuple
+            (guild ID, user ID).
+        timestamp: float
+            The time of the message.
+        cooldown: float
+            The cooldown of the guild, in seconds.
+
+        Returns:
+        --------
+        bool
+            True if the user can earn XP, False if they are still on cooldown.
+        """
+        lastEarned = self.lastEarned.get(key)
+        if lastEarned is not None and timestamp - lastEarned <= cooldown:
+            return False
+        self.lastEarned[key] = timestamp
+        return True
+
+    def checkUnordered(self, key, timestamp, cooldown):
+        """Like check, but for messages that are not seen in time order.
+
+        A message within the cooldown of the last one that earned XP, before or
+        after it, does not earn XP.
+        """
+        lastEarned = self.lastEarned.get(key)
+        if lastEarned is not None and abs(timestamp - lastEarned) <= cooldown:
+            return False
+        self.lastEarned[key] = timestamp
+        return True
+
+    def prune(self, now, getCooldown):
+        """Remove users whose cooldown has passed.
+
+        Parameters:
+        -----------
+        now: float
+            The current time, in the same form as message timestamps.
+        getCooldown: callable
+            Takes a guild ID and returns its cooldown in seconds.
+        """
+        self.lastEarned = {key: lastEarned for key, lastEarned in self.lastEarned.items()
+                           if now - lastEarned <= getCooldown(key[0])}
+
+class Leaderboard:
+    """The XP of the users in a guild, kept sorted by XP.
+
+    Ranks and top users are looked up by bisecting, without touching the database.
+    """
+
+    def __init__(self, scores=None):
+        """
+        Parameters:
+        -----------
+        scores: dict
+            User ID -> XP.
+        """
+        self.scores = scores or {}
+        # (-XP, user ID), so the highest XP comes first.
+        self.ranked = sorted((-xp, userID) for userID, xp in self.scores.items())
+
+    def __len__(self):
+        return len(self.ranked)
+
+    def add(self, userID, points):
+        """Add XP to a user, keeping the leaderboard sorted."""
+        oldXP = self.scores.get(userID)
+        if oldXP is not None:
+            if not points:
+                return
+            del self.ranked[bisect.bisect_left(self.ranked, (-oldXP, userID))]
+        newXP = (oldXP or 0) + points
+        self.scores[userID] = newXP
+        bisect.insort(self.ranked, (-newXP, userID))
+
+    def getXP(self, userID):
+        """Get the XP of a user, or None if they have none."""
+        return self.scores.get(userID)
+
+    def getRank(self, userID):
+        """Get the rank of a user, or None if they have no XP.
+
+        Users with the same XP share a rank.
+        """
+        xp = self.scores.get(userID)
+        if xp is None:
+            return None
+        # (-xp,) sorts before every entry with this XP.
+        return bisect.bisect_left(self.ranked, (-xp,)) + 1
+
+    def after(self, key, count):
+        """Get the next entries of the leaderboard, highest XP first.
+
+        Parameters:
+        -----------
+        key: tuple
+            The (-XP, user ID) of the last entry already read, or None to start
+            from the top.
+        count: int
+            The maximum number of entries to get.
+
+        Returns:
+        --------
+        [(int, str)]
+            The (-XP, user ID) of the entries after key.
+        """
+        index = bisect.bisect_right(self.ranked, key) if key else 0
+        return self.ranked[index:index + count]
+
+class LeaderboardEntries:
+    """Leaderboard entries of current members, only read and formatted when accessed.
+
+    The leaderboard is read with keyset pagination: each read continues after the
+    last (-XP, user ID) read, so later pages never re-read earlier rows.  Users who
+    left the server are skipped by reading more rows.
+    """
+
+    def __init__(self, leaderboard, count, getName, levelCurve):
+        """
+        Parameters:
+        -----------
+        leaderboard: Leaderboard
+            The leaderboard of the server.
+        count: int
+            The number of members on the leaderboard.
+        getName: callable
+            Takes a user ID, and returns their display name, or None if they are
+            not a member.
+        levelCurve: LevelCurve
+            The level curve of the server.
+        """
+        self.leaderboard = leaderboard
+        self.count = count
+        self.getName = getName
+        self.levelCurve = levelCurve
+        self.entries = []
+        self.lastKey = None
+        self.exhausted = False
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            self._read(self.count if index.stop is None else index.stop)
+        else:
+            self._read(index + 1)
+        return self.entries[index]
+
+    def _read(self, size):
+        """Read the leaderboard until there are at least size entries."""
+        while len(self.entries) < size and not self.exhausted:
+            rows = self.leaderboard.after(self.lastKey, LEADERBOARD_FETCH)
+            if not rows:
+                self.exhausted = True
+            for negXP, userID in rows:
+                self.lastKey = (negXP, userID)
+                name = self.getName(userID)
+                if name is None:
+                    continue
+                self.entries.append("{0}: {1} XP (level {2})".format(
+                    name, -negXP, self.levelCurve.getLevel(-negXP)[0]))
+
+class DatabasePool:
+    """Runs blocking database queries off the event loop.
+
+    Queries run in a thread pool, and each thread keeps its own persistent
+    connection, so a slow database never blocks the bot, and no query pays for a
+    new connection.
+    """
+
+    def __init__(self, loop, storage, workers=DB_WORKERS):
+        """
+        Parameters:
+        -----------
+        loop: asyncio.AbstractEventLoop
+            The event loop of the bot.
+        storage: MySQLStorage or SQLiteStorage
+            The storage backend to run queries on.
+        workers: int
+            The number of threads, and thus connections, to use.
+        """
+        self.loop = loop
+        self.storage = storage
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def _getConnection(self):
+        """Get the connection of the current thread, connecting if needed."""
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.storage.connect()
+            self.local.connection = connection
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    def _dropConnection(self):
+        """Forget the connection of the current thread, e.g. after it dropped."""
+        connection = getattr(self.local, "connection", None)
+        self.local.connection = None
+        if connection is None:
+            return
+        with self.lock:
+            self.connections.remove(connection)
+        try:
+            connection.close()
+        except self.storage.error:
+            pass
+
+    def _execute(self, query, *args):
+        """Run a query in the current thread, reconnecting once if needed."""
+        try:
+            return query(self._getConnection(), *args)
+        except self.storage.disconnectError:
+            # The server may have closed an idle connection, so retry once.
+            self._dropConnection()
+            return query(self._getConnection(), *args)
+
+    async def run(self, query, *args):
+        """Run a query in the thread pool.
+
+        Parameters:
+        -----------
+        query: callable
+            A function taking a connection, followed by args.
+        *args
+            The arguments to pass to query.
+
+        Returns:
+        --------
+        The return value of query.
+        """
+        return await self.loop.run_in_executor(self.executor, self._execute,
+                                               query, *args)
+
+    def submit(self, query, *args):
+        """Queue a query in the thread pool without waiting for it.
+
+        Parameters:
+        -----------
+        query: callable
+            A function taking a connection, followed by args.
+        *args
+            The arguments to pass to query.
+
+        Returns:
+        --------
+        concurrent.futures.Future
+            The future of the query.
+        """
+        return self.executor.submit(self._execute, query, *args)
+
+    def close(self):
+        """Close all connections once pending queries are done.
+
+        This does not wait, so a slow or unreachable database cannot freeze the bot.
+        """
+        self.loop.run_in_executor(None, self._shutdown)
+
+    def _shutdown(self):
+        """Wait for pending queries, then close all connections."""
+        self.executor.shutdown(wait=True)
+        with self.lock:
+            for connection in self.connections:
+                try:
+                    connection.close()
+                except self.storage.error:
+                    pass
+            self.connections = []
+
 class Ranks:
     """Mee6-inspired guild rank management system.
     Not optimized for multi-guild deployments.
@@ -50,7 +531,36 @@ class Ranks:
         checkFolder()
         checkFiles()
         self.settings = dataIO.load_json(SAVE_FOLDER + 'settings.json')
-        self.lastspoke = dataIO.load_json(SAVE_FOLDER + 'lastspoke.json')
+        self.cooldowns = Cooldowns()
+        # (guild ID, user ID) -> (display name or None, expiry), see getDisplayName.
+        self.displayNames = {}
+        # Guild ID -> backfill checkpoints, see backfill.
+        self.backfillProgress = dataIO.load_json(BACKFILL_FILE)
+        # Guild ID -> running backfill task.
+        self.backfills = {}
+        self.database = self.openDatabase()
+        # (guild ID, user ID) -> XP gained since the last flush.
+        self.pendingXP = {}
+        # (a, b, c) -> LevelCurve, shared by guilds using the same curve.
+        self.levelCurves = {}
+        # Guild ID -> Leaderboard, set once loadLeaderboards is done.
+        self.leaderboards = {}
+        self.loaded = asyncio.Event()
+        self.loadTask = self.bot.loop.create_task(self.loadLeaderboards())
+        self.flushTask = self.bot.loop.create_task(self.flushLoop())
+        self.pruneTask = self.bot.loop.create_task(self.pruneLoop())
+
+    # Write accumulated XP, and close the database connections on cog unload.
+    def __unload(self): # pylint: disable=invalid-name
+        self.loadTask.cancel()
+        self.flushTask.cancel()
+        self.pruneTask.cancel()
+        for task in self.backfills.values():
+            task.cancel()
+        rows = self.takePendingXP()
+        if rows:
+            self.database.submit(self.database.storage.addPoints, rows)
+        self.database.close()
 
     ############
     # COMMANDS #
@@ -60,86 +570,57 @@ class Ranks:
     @commands.command(name="levels", pass_context=True, no_pm=True)
     async def _ranksLevels(self, ctx):
         """Show the server ranking leaderboard"""
-        # Execute a MySQL query to order and check.
-
-        database = MySQLdb.connect(host=self.settings["mysql_host"],
-                                   user=self.settings["mysql_username"],
-                                   passwd=self.settings["mysql_password"])
-        cursor = database.cursor()
-        cursor.execute("SELECT userid, xp FROM renbot.xp WHERE guildid = {0} "
-                       "order by xp desc limit 20".format(ctx.message.server.id))
-
-        msg = ":information_source: **Ranks - Leaderboard (WIP)**\n```"
-
-        rank = 1
-        for row in cursor.fetchall():
-            # row[0]: userID
-            # row[1]: xp
-            userID = row[0]
-            userObject = ctx.message.server.get_member(str(userID))
-            exp = row[1]
-
-            # Lookup the ID against the guild
-            if userObject is None:
-                continue
-
-            msg += str(rank).ljust(3)
-            msg += (str(userObject.display_name) + " ").ljust(23)
-            msg += str(exp).rjust(10) + "\n"
-
-            rank += 1
-            if rank == 11:
-                break
+        if not self.loaded.is_set():
+            await self.sayLoading()
+            return
+        server = ctx.message.server
+        leaderboard = self.leaderboards.get(server.id, Leaderboard())
+
+        # Count members with XP, going through whichever of the two is smaller.
+        if len(server.members) < len(leaderboard):
+            count = sum(1 for member in server.members if
+                        member.id in leaderboard.scores)
+        else:
+            count = sum(1 for userID in leaderboard.scores if server.get_member(userID))
+        if not count:
+            await self.bot.say(":information_source: **Ranks - Leaderboard**: Nobody "
+                               "has earned any XP yet.")
+            return
 
-        msg += "```\n Full rankings at https://ren.injabie3.moe/ranks/"
-        await self.bot.say(msg)
-        cursor.close()
-        database.close()
+        entries = LeaderboardEntries(leaderboard, count,
+                                     lambda userID: self.getDisplayName(server, userID),
+                                     self.getLevelCurve(server.id))
+        page = Pages(self.bot, message=ctx.message, entries=entries,
+                     per_page=LEADERBOARD_PAGE)
+        page.embed.title = "Leaderboard for **{}**".format(server.name)
+        page.embed.colour = discord.Colour.red()
+        await page.paginate()
 
     # [p]rank
     @commands.command(name="rank", pass_context=True, no_pm=True)
-    async def _ranksCheck(self, ctx, ofUser: discord.Member = None): \
-        # pylint: disable=too-many-locals
+    async def _ranksCheck(self, ctx, ofUser: discord.Member = None):
         """Check your rank in the server."""
         if ofUser is None:
             ofUser = ctx.message.author
 
-        # Execute a MySQL query to order and check.
-        database = MySQLdb.connect(host=self.settings["mysql_host"],
-                                   user=self.settings["mysql_username"],
-                                   passwd=self.settings["mysql_password"])
-        cursor = database.cursor()
-
-        # Using query code from:
-        # https://stackoverflow.com/questions/13566695/select-increment-counter-in-mysql
-        # This code is now included in the stored procedure in the database.
-
-        cursor.execute("CALL renbot.getUserInfo({0},{1})".format(
-            ctx.message.server.id, ofUser.id))
-        embed = discord.Embed()
-        data = cursor.fetchone() # Data from the database.
-
-        try:
-            LOGGER.info(data)
-            rank = data[0]
-            userID = data[1]
-            level = data[2]
-            levelXP = data[3]
-            currentXP = data[4]
-            totalXP = data[5]
-            currentLevelXP = currentXP - totalXP
-        except IndexError as error:
-            await self.bot.say("Something went wrong when checking your level.  "
-                               "Please notify the admin!")
-            LOGGER.error(error)
-            database.close()
+        if not self.loaded.is_set():
+            await self.sayLoading()
+            return
+        leaderboard = self.leaderboards.get(ctx.message.server.id, Leaderboard())
+        rank = leaderboard.getRank(ofUser.id)
+        if rank is None:
+            await self.bot.say(":information_source: **Ranks**: {} has not earned any "
+                               "XP yet.".format(ofUser.display_name))
             return
 
+        currentXP = leaderboard.getXP(ofUser.id)
+        level, levelXP, totalXP = self.getLevelCurve(ctx.message.server.id) \
+                                  .getLevel(currentXP)
+        currentLevelXP = currentXP - totalXP
 
-        userObject = ctx.message.server.get_member(str(userID))
-
-        embed.set_author(name=userObject.display_name,
-                         icon_url=userObject.avatar_url)
+        embed = discord.Embed()
+        embed.set_author(name=ofUser.display_name,
+                         icon_url=ofUser.avatar_url)
         embed.colour = discord.Colour.red()
         embed.add_field(name="Rank", value=int(rank))
         embed.add_field(name="Level", value=level)
@@ -148,7 +629,6 @@ class Ranks:
         embed.set_footer(text="Note: This EXP is different from Mee6.")
 
         await self.bot.say(embed=embed)
-        database.close()
 
     @commands.group(name="ranks", pass_context=True, no_pm=True)
     async def _ranks(self, ctx):
@@ -192,6 +672,7 @@ class Ranks:
         try:
             cooldown = self.settings[sid]["cooldown"]
             maxPoints = self.settings[sid]["maxPoints"]
+            levelCurve = self.settings[sid].get("levelCurve", DEFAULT_LEVEL_CURVE)
         except KeyError:
             # Not set.
             await self.bot.say(":warning: **Ranks - Current Settings**: The server is "
@@ -200,7 +681,9 @@ class Ranks:
             return
         msg = ":information_source: **Ranks - Current Settings**:\n```"
         msg += "Cooldown time:  {0} seconds.\n".format(cooldown)
-        msg += "Maximum points: {0} points per eligible message```".format(maxPoints)
+        msg += "Maximum points: {0} points per eligible message\n".format(maxPoints)
+        msg += "Level curve:    {0}n^2 + {1}n + {2} XP from level n to n + 1```" \
+               .format(*levelCurve)
 
         await self.bot.say(msg)
 
@@ -267,6 +750,69 @@ class Ranks:
         LOGGER.info("Maximum points per message set to %s.",
                     maxpoints)
 
+    #[p]rank settings levelcurve
+    @_settings.command(name="levelcurve", pass_context=True)
+    async def _settingsLevelCurve(self, ctx, a: int = DEFAULT_LEVEL_CURVE[0],
+                                  b: int = DEFAULT_LEVEL_CURVE[1],
+                                  c: int = DEFAULT_LEVEL_CURVE[2]): \
+        # pylint: disable=invalid-name
+        """Set the XP needed to go from level n to n + 1 to a*n^2 + b*n + c.
+
+        Defaults to the Mee6 curve, 5n^2 + 50n + 100.
+        """
+        sid = ctx.message.server.id
+
+        if a < 0 or b < 0 or c < 1:
+            await self.bot.say(":negative_squared_cross_mark: **Ranks - Level Curve**: "
+                               "a and b must be at least 0, and c at least 1.")
+            return
+
+        # Save settings
+        self.settings = dataIO.load_json(SAVE_FOLDER + 'settings.json')
+        # Make sure the server id key exists.
+        if sid not in self.settings.keys():
+            self.settings[sid] = {}
+        self.settings[sid]["levelCurve"] = [a, b, c]
+        dataIO.save_json(SAVE_FOLDER + 'settings.json', self.settings)
+
+        await self.bot.say(":white_check_mark: **Ranks - Level Curve**: Going from "
+                           "level n to n + 1 now takes {0}n^2 + {1}n + {2} "
+                           "XP.".format(a, b, c))
+        LOGGER.info("Level curve changed by %s#%s (%s)",
+                    ctx.message.author.name,
+                    ctx.message.author.discriminator,
+                    ctx.message.author.id)
+        LOGGER.info("Level curve set to %s",
+                    [a, b, c])
+
+    #[p]rank settings backfill
+    @_settings.command(name="backfill", pass_context=True, no_pm=True)
+    @checks.serverowner()
+    async def _settingsBackfill(self, ctx):
+        """Give XP for messages sent before ranks was enabled.
+
+        Goes through the history of every channel, using the same cooldown and
+        points rules as new messages.  Channels are read one after another, so a
+        user active in several channels at once may still earn slightly more than
+        they would have live.  Run this again to resume after a restart or error.
+        """
+        sid = ctx.message.server.id
+        task = self.backfills.get(sid)
+        if task and not task.done():
+            await self.bot.say(":negative_squared_cross_mark: **Ranks - Backfill**: "
+                               "A backfill is already running on this server!")
+            return
+
+        status = await self.bot.say(":information_source: **Ranks - Backfill**: "
+                                    "Starting...")
+        task = self.bot.loop.create_task(self.backfill(ctx.message.server, status))
+        task.add_done_callback(self._backfillDone)
+        self.backfills[sid] = task
+        LOGGER.info("Backfill started by %s#%s (%s)",
+                    ctx.message.author.name,
+                    ctx.message.author.discriminator,
+                    ctx.message.author.id)
+
     #[p]rank settings dbsetup
     @_settings.command(name="dbsetup", pass_context=True)
     @checks.serverowner()
@@ -307,55 +853,335 @@ class Ranks:
         self.settings["mysql_host"] = host.content
         self.settings["mysql_username"] = username.content
         self.settings["mysql_password"] = password.content
+        self.settings["backend"] = BACKEND_MYSQL
         dataIO.save_json(SAVE_FOLDER + 'settings.json', self.settings)
 
+        # Reconnect with the new settings.
+        await self.reopenDatabase()
+
         await self.bot.say("Settings saved.")
         LOGGER.info("Database connection changed by %s#%s (%s)",
                     ctx.message.author.name,
                     ctx.message.author.discriminator,
                     ctx.message.author.id)
 
+    #[p]rank settings backend
+    @_settings.command(name="backend", pass_context=True)
+    @checks.serverowner()
+    async def _settingsBackend(self, ctx, backend: str):
+        """Set where XP is stored: mysql or sqlite.
+
+        XP is not copied between backends.
+        """
+        backend = backend.lower()
+        if backend not in (BACKEND_MYSQL, BACKEND_SQLITE):
+            await self.bot.say(":negative_squared_cross_mark: **Ranks - Backend**: "
+                               "Please choose either `{}` or `{}`.".format(BACKEND_MYSQL,
+                                                                         BACKEND_SQLITE))
+            return
+        if backend == BACKEND_MYSQL and MySQLdb is None:
+            await self.bot.say(":negative_squared_cross_mark: **Ranks - Backend**: "
+                               "MySQLdb is not installed!")
+            return
+
+        # Save settings
+        self.settings = dataIO.load_json(SAVE_FOLDER + 'settings.json')
+        self.settings["backend"] = backend
+        dataIO.save_json(SAVE_FOLDER + 'settings.json', self.settings)
+
+        await self.reopenDatabase()
+
+        await self.bot.say(":white_check_mark: **Ranks - Backend**: XP is now stored "
+                           "using {}.".format(backend))
+        LOGGER.info("Backend changed to %s by %s#%s (%s)",
+                    backend,
+                    ctx.message.author.name,
+                    ctx.message.author.discriminator,
+                    ctx.message.author.id)
+
     ####################
     # HELPER FUNCTIONS #
     ####################
 
+    def openDatabase(self):
+        """Open the storage backend chosen in the settings.
+
+        Defaults to MySQL if it was set up before backends were selectable, and to
+        SQLite otherwise.
+        """
+        backend = self.settings.get("backend", BACKEND_MYSQL if "mysql_host" in
+                                    self.settings else BACKEND_SQLITE)
+        if backend == BACKEND_MYSQL:
+            storage = MySQLStorage(self.settings)
+        else:
+            storage = SQLiteStorage(SQLITE_FILE)
+        return DatabasePool(self.bot.loop, storage)
+
+    async def sayLoading(self):
+        """Tell the user that XP is still being loaded from the database."""
+        await self.bot.say(":hourglass: **Ranks**: The leaderboard is still loading "
+                           "from the database.  Please try again later.")
+
+    async def reopenDatabase(self):
+        """Write pending XP, then switch to the backend chosen in the settings."""
+        if self.loaded.is_set():
+            await self.flushPoints()
+        # Otherwise the old backend never loaded, and pending XP goes to the new one.
+        # Stop XP writes right away, so none reach the new backend while it loads.
+        self.loaded.clear()
+        self.database.close()
+        self.database = self.openDatabase()
+        self.loadTask.cancel()
+        self.loadTask = self.bot.loop.create_task(self.loadLeaderboards())
+
+    async def loadLeaderboards(self):
+        """Load the XP of every user into the in-memory leaderboards.
+
+        XP is not written until this is done, so the loaded XP together with the
+        pending XP is exactly the XP of every user.
+        """
+        self.loaded.clear()
+        while True:
+            try:
+                rows = await self.database.run(self.database.storage.allXP)
+                break
+            except Exception as error: # pylint: disable=broad-except
+                LOGGER.error("Could not load XP, retrying in %s seconds: %s",
+                             LOAD_RETRY_INTERVAL, error)
+                await asyncio.sleep(LOAD_RETRY_INTERVAL)
+
+        scores = {}
+        for guildID, userID, xp in rows:
+            scores.setdefault(str(guildID), {})[str(userID)] = xp
+        leaderboards = {guildID: Leaderboard(guildScores) for guildID, guildScores
+                        in scores.items()}
+        for (guildID, userID), xp in self.pendingXP.items():
+            leaderboards.setdefault(guildID, Leaderboard()).add(userID, xp)
+
+        self.leaderboards = leaderboards
+        self.loaded.set()
+        LOGGER.info("Loaded XP of %s users in %s guilds.", len(rows), len(leaderboards))
+
     def addPoints(self, guildID, userID):
-        """Add rank points between 0 and MAX_POINTS to the user"""
+        """Add rank points between 0 and MAX_POINTS to the user.
+
+        The points are added to the leaderboard, and accumulated in memory until
+        flushPoints writes them.
+        """
         try:
             pointsToAdd = random.randint(0, self.settings[guildID]["maxPoints"])
         except KeyError:
             # Most likely key error, use default 25.
             pointsToAdd = random.randint(0, 25)
 
-        database = MySQLdb.connect(host=self.settings["mysql_host"],
-                                   user=self.settings["mysql_username"],
-                                   passwd=self.settings["mysql_password"])
-        cursor = database.cursor()
-        fetch = cursor.execute("SELECT xp from renbot.xp WHERE userid = {0} and "
-                               "guildid = {1}".format(userID, guildID))
+        key = (guildID, userID)
+        self.pendingXP[key] = self.pendingXP.get(key, 0) + pointsToAdd
+        if self.loaded.is_set():
+            self.leaderboards.setdefault(guildID, Leaderboard()).add(userID, pointsToAdd)
 
-        currentXP = 0
+    def takePendingXP(self):
+        """Take the accumulated XP, leaving nothing pending.
 
-        if fetch != 0: # This user has past XP that we can add to.
-            result = cursor.fetchall()
-            currentXP = result[0][0] + pointsToAdd
-        else: # New user
-            currentXP = pointsToAdd
-
-        cursor.execute("REPLACE INTO renbot.xp (userid, guildid, xp) VALUES ({0}, "
-                       "{1}, {2})".format(userID, guildID, currentXP))
-        database.commit()
-        cursor.close()
-        database.close()
+        Returns:
+        --------
+        rows: list
+            (userID, guildID, xp) tuples, as used by the storage backends.
+        """
+        pending = self.pendingXP
+        self.pendingXP = {}
+        return [(userID, guildID, xp) for (guildID, userID), xp in pending.items()]
+
+    async def flushPoints(self):
+        """Write accumulated XP to the database in one batch."""
+        await self.loaded.wait()
+        rows = self.takePendingXP()
+        if not rows:
+            return
+        try:
+            await self.database.run(self.database.storage.addPoints, rows)
+        except Exception as error: # pylint: disable=broad-except
+            # Keep the XP so the next flush tries again.
+            for userID, guildID, xp in rows:
+                key = (guildID, userID)
+                self.pendingXP[key] = self.pendingXP.get(key, 0) + xp
+            LOGGER.error("Could not write XP of %s users: %s", len(rows), error)
+
+    async def flushLoop(self):
+        """Write accumulated XP every FLUSH_INTERVAL seconds."""
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await self.flushPoints()
+
+    async def backfill(self, server, status):
+        """Give XP for the message history of a server.
+
+        Channels are read oldest first, one page at a time, so memory use does not
+        depend on the size of the history.  After each page the XP is written, and
+        the last message read is saved as the checkpoint of the channel.  Messages
+        sent after the first run started are skipped, since they already earned
+        XP.  Cooldowns are shared by all channels of the server, and since they are
+        not read in time order, a message close to an earlier or later one that
+        earned XP does not earn any.
+
+        Parameters:
+        -----------
+        server: discord.Server
+            The server to backfill.
+        status: discord.Message
+            The message to edit with progress updates.
+        """
+        await self.loaded.wait()
+        progress = self.backfillProgress.setdefault(server.id, {
+            "until": str(discord.utils.time_snowflake(datetime.utcnow())),
+            "channels": {}, # Channel ID -> ID of the last message read.
+            "done": []})
+        until = int(progress["until"])
+        channels = [channel for channel in server.channels
+                    if channel.type == discord.ChannelType.text]
+        cooldown = self.getCooldown(server.id)
+        cooldowns = Cooldowns()
+        messages = 0
+        started = time.monotonic()
+        lastReport = started
+
+        for channel in channels:
+            if channel.id in progress["done"]:
+                continue
+            finished = False
+            while not finished:
+                after = discord.Object(id=progress["channels"].get(channel.id, "0"))
+                count = 0
+                failure = None
+                try:
+                    async for message in self.bot.logs_from(channel, limit=BACKFILL_PAGE,
+                                                            after=after, reverse=True):
+                        if int(message.id) >= until:
+                            finished = True
+                            break
+                        count += 1
+                        progress["channels"][channel.id] = message.id
+                        if message.author.bot:
+                            continue
+                        if cooldowns.checkUnordered(message.author.id,
+                                                    message.timestamp.timestamp(),
+                                                    cooldown):
+                            self.addPoints(server.id, message.author.id)
+                except (discord.Forbidden, discord.NotFound):
+                    # No permission to read the history of this channel, or it was
+                    # deleted.
+                    finished = True
+                except discord.HTTPException as error:
+                    # Keep what was read so far, and stop until run again.
+                    failure = error
+                if count < BACKFILL_PAGE and not failure:
+                    finished = True
+
+                await self.flushPoints()
+                if finished:
+                    progress["done"].append(channel.id)
+                    progress["channels"].pop(channel.id, None)
+                dataIO.save_json(BACKFILL_FILE, self.backfillProgress)
+
+                messages += count
+                if failure:
+                    LOGGER.error("Backfill of %s (%s) stopped reading #%s (%s): %s",
+                                 server.name, server.id, channel.name, channel.id,
+                                 failure)
+                    await self.reportBackfill(status, "Stopped, could not read #{}.  "
+                                              "Run the command again to resume."
+                                              .format(channel.name),
+                                              len(progress["done"]), len(channels),
+                                              messages, time.monotonic() - started)
+                    return
+                now = time.monotonic()
+                if now - lastReport >= BACKFILL_REPORT_INTERVAL:
+                    lastReport = now
+                    await self.reportBackfill(status, "Reading #{}...".format(channel.name),
+                                              len(progress["done"]), len(channels),
+                                              messages, now - started)
+
+        elapsed = time.monotonic() - started
+        await self.reportBackfill(status, "Done!", len(progress["done"]), len(channels),
+                                  messages, elapsed)
+        LOGGER.info("Backfill of %s (%s) read %s messages in %.0f seconds.",
+                    server.name, server.id, messages, elapsed)
+
+    @staticmethod
+    def _backfillDone(task):
+        """Log errors that ended a backfill task."""
+        if not task.cancelled() and task.exception():
+            LOGGER.error("Backfill failed!", exc_info=task.exception())
+
+    async def reportBackfill(self, status, state, done, total, messages, elapsed): \
+        # pylint: disable=too-many-arguments
+        """Edit the backfill status message with the current progress."""
+        rate = messages / elapsed if elapsed else 0
+        try:
+            await self.bot.edit_message(status, ":information_source: **Ranks - "
+                                        "Backfill**: {0}  {1}/{2} channels done, {3} "
+                                        "messages read ({4:.0f} messages/s)."
+                                        .format(state, done, total, messages, rate))
+        except discord.HTTPException:
+            pass
+
+    def getLevelCurve(self, guildID):
+        """Get the level curve of a guild, computing it on first use."""
+        try:
+            coefficients = tuple(self.settings[guildID]["levelCurve"])
+        except KeyError:
+            coefficients = DEFAULT_LEVEL_CURVE
+        levelCurve = self.levelCurves.get(coefficients)
+        if levelCurve is None:
+            levelCurve = LevelCurve(*coefficients)
+            self.levelCurves[coefficients] = levelCurve
+        return levelCurve
+
+    def getCooldown(self, guildID):
+        """Get the cooldown of a guild in seconds, 0 if not configured."""
+        try:
+            return self.settings[guildID]["cooldown"]
+        except KeyError:
+            return 0
+
+    def getDisplayName(self, server, userID):
+        """Get the display name of a member, caching it for NAME_CACHE_TTL seconds.
+
+        Parameters:
+        -----------
+        server: discord.Server
+            The server to look the member up in.
+        userID: str
+            The user ID.
+
+        Returns:
+        --------
+        str
+            The display name, or None if the user is not a member.
+        """
+        now = time.monotonic()
+        key = (server.id, userID)
+        cached = self.displayNames.get(key)
+        if cached and cached[1] > now:
+            return cached[0]
+        member = server.get_member(userID)
+        name = member.display_name if member else None
+        self.displayNames[key] = (name, now + NAME_CACHE_TTL)
+        return name
+
+    async def pruneLoop(self):
+        """Remove expired cooldowns and names every PRUNE_INTERVAL seconds."""
+        while True:
+            await asyncio.sleep(PRUNE_INTERVAL)
+            # Message timestamps are naive UTC, so compare against the same.
+            self.cooldowns.prune(datetime.utcnow().timestamp(), self.getCooldown)
+            now = time.monotonic()
+            self.displayNames = {key: cached for key, cached in self.displayNames.items()
+                                 if cached[1] > now}
 
     async def checkFlood(self, message):
         """Check to see if the user is sending messages that are flooding the server.
         If yes, then do not add points.
         """
-        # Decide whether to store last spoken user data in:
-        #  - MySQL
-        #  - JSON
-        #  - or leave in RAM.
         # Check as follows:
         #  - Get the user ID and message time
         #  - Check the last message time that was used to add points to the current
@@ -365,8 +1191,7 @@ class Ranks:
         #    with the message time.
         #  - Add points between 0 and MAX_POINTS (use random).
         #  - Return.
-
-        timestamp = message.timestamp.timestamp()
+        # Last spoken times are kept in RAM only, see Cooldowns.
 
         if message.author.bot:
             return
@@ -377,27 +1202,9 @@ class Ranks:
         sid = message.server.id
         uid = message.author.id
 
-        try:
-            # If the time does not exceed COOLDOWN, return and do nothing.
-            if timestamp - self.lastspoke[sid][uid]["timestamp"] <= self.settings[sid]["cooldown"]:
-                return
-            # Update last spoke time with new message time.
-        except KeyError:
-            # Most likely key error, so create the key, then update
-            # last spoke time with new message time.
-            try:
-                self.lastspoke[sid][uid] = {}
-            except KeyError:
-                self.lastspoke[sid] = {}
-                self.lastspoke[sid][uid] = {}
-            LOGGER.error("%s#%s (%s) has not spoken since last restart, adding new "
-                         "timestamp",
-                         message.author.name,
-                         message.author.discriminator,
-                         uid)
-
-        self.lastspoke[sid][uid]["timestamp"] = timestamp
-        self.addPoints(message.server.id, message.author.id)
+        if self.cooldowns.check((sid, uid), message.timestamp.timestamp(),
+                                self.getCooldown(sid)):
+            self.addPoints(sid, uid)
 
 def setup(bot):
     """Add the cog to the bot"""
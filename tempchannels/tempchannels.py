@@ -1,14 +1,15 @@
 """Temporary channel cog.
 
-Creates a temporary channel.
+Creates temporary channels.
 """
 import asyncio
 from copy import deepcopy
+from datetime import datetime, timedelta
+import heapq
 import itertools
 import json # Will need this to use in conjunction with aiohttp below.
 import logging
 import os
-from threading import Lock
 import time
 import aiohttp # Using this to build own request to Discord API for NSFW.
 import discord
@@ -17,6 +18,8 @@ from cogs.utils import checks, config
 from cogs.utils.dataIO import dataIO
 
 KEY_SETTINGS = "settings"
+KEY_SCHEDULES = "schedules"
+KEY_SELECTED = "selected"
 KEY_CH_ID = "channel"
 KEY_CH_TOPIC = "channelTopic"
 KEY_CH_NAME = "channelName"
@@ -32,6 +35,7 @@ KEY_ENABLED = "enabled"
 KEY_NSFW = "nsfw"
 KEY_ROLE_ALLOW = "roleallow"
 KEY_ROLE_DENY = "roledeny"
+KEY_WEEKDAYS = "weekdays"
 
 KEYS_REQUIRED = \
 [KEY_CH_ID, KEY_CH_TOPIC, KEY_CH_NAME, KEY_CH_POS, KEY_CH_CREATED, KEY_CH_CATEGORY,
@@ -43,8 +47,16 @@ LOGGER = None
 MAX_CH_NAME = 25
 MAX_CH_POS = 100
 MAX_CH_TOPIC = 1024
+MAX_SCHEDULE_NAME = 25
+MAX_SCHEDULES = 25
+
+DEFAULT_SCHEDULE = "default" # Name of the schedule migrated from the old settings.
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
 
 PATH_CH = "https://discordapp.com/api/channels/{}"
+PATH_GUILD_CH = "https://discordapp.com/api/guilds/{}/channels"
+REST_POOL_SIZE = 10 # Max number of simultaneous connections to the Discord API.
+REST_MAX_RETRIES = 5 # Max number of attempts for a raw API request that got a 429.
 PERMS_READ_Y = discord.PermissionOverwrite(read_messages=True, add_reactions=False)
 PERMS_READ_N = discord.PermissionOverwrite(read_messages=False, add_reactions=False)
 PERMS_SEND_N = discord.PermissionOverwrite(send_messages=False, add_reactions=False)
@@ -52,6 +64,7 @@ PERMS_SEND_N = discord.PermissionOverwrite(send_messages=False, add_reactions=Fa
 SAVE_FOLDER = "data/lui-cogs/tempchannels/"
 SAVE_FILE = "settings.json"
 SLEEP_TIME = 15 # Background loop sleep time in seconds
+MAX_CONCURRENT_SERVERS = 10 # Max number of servers to create/delete channels on at once.
 
 
 DEFAULT_DICT = \
@@ -69,7 +82,8 @@ DEFAULT_DICT = \
     KEY_ENABLED: False,
     KEY_NSFW: False,
     KEY_ROLE_ALLOW: [],
-    KEY_ROLE_DENY: []
+    KEY_ROLE_DENY: [],
+    KEY_WEEKDAYS: list(range(len(WEEKDAYS)))
 }
 
 def checkFilesystem():
@@ -115,6 +129,178 @@ def _createPermList(serverRoleList, roleIdList, perms):
                                       fillvalue=perms)
     return tupleList
 
+def _createOverwrite(target, perms):
+    """Create a permission overwrite object to send to the Discord API.
+
+    Parameters:
+    -----------
+    target: discord.Role or discord.User
+        The role or user these permissions apply to.
+    perms: discord.PermissionsOverwrite
+        The permissions for this role or user.
+
+    Returns:
+    --------
+    overwrite: dict
+        A permission overwrite, as used in the permission_overwrites field of a
+        channel.
+    """
+    allow, deny = perms.pair()
+    return {"id": target.id,
+            "type": "role" if isinstance(target, discord.Role) else "member",
+            "allow": allow.value,
+            "deny": deny.value}
+
+def _migrateSettings(settings):
+    """Move single-channel server settings into a schedule collection.
+
+    Servers used to have exactly one temporary channel, with its properties stored
+    directly in the server settings.  These are moved into a schedule named
+    DEFAULT_SCHEDULE, which is also selected for editing.
+
+    Parameters:
+    -----------
+    settings: dict
+        The settings for all servers.  This is modified in place.
+
+    Returns:
+    --------
+    migrated: [str]
+        The IDs of the servers that were migrated.
+    """
+    migrated = []
+    for sid, properties in settings.items():
+        if KEY_SCHEDULES in properties:
+            continue
+        settings[sid] = {KEY_SCHEDULES: {DEFAULT_SCHEDULE: properties},
+                         KEY_SELECTED: DEFAULT_SCHEDULE}
+        migrated.append(sid)
+    return migrated
+
+def _nextStart(properties, now):
+    """Get the next time a schedule should create its channel.
+
+    A start time counts as current for its whole minute, so a channel that should
+    have been created at the start of this minute is still due.
+
+    Parameters:
+    -----------
+    properties: dict
+        The schedule settings.
+    now: datetime.datetime
+        The current local time.
+
+    Returns:
+    --------
+    start: float
+        The epoch time of the next start, or None if the schedule has no weekdays.
+    """
+    weekdays = properties.get(KEY_WEEKDAYS, DEFAULT_DICT[KEY_WEEKDAYS])
+    start = now.replace(hour=properties[KEY_START_HOUR],
+                        minute=properties[KEY_START_MIN],
+                        second=0, microsecond=0)
+    for _ in range(len(WEEKDAYS) + 1):
+        if start.weekday() in weekdays and start + timedelta(minutes=1) > now:
+            return start.timestamp()
+        start += timedelta(days=1)
+    return None
+
+
+class RestClient:
+    """Small client for raw Discord API calls that the library does not support.
+
+    All requests share one long-lived session, so connections are kept alive and
+    pooled.  The rate limit headers in responses are honoured: if a route has no
+    requests remaining, the next request on it waits until the limit resets, and a
+    request that got a 429 is retried after the time Discord asked us to wait.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=REST_POOL_SIZE, loop=bot.loop),
+            loop=bot.loop)
+        # Route -> epoch time at which we may send requests on this route again.
+        self.resetTimes = {}
+
+    def close(self):
+        """Close the underlying session and all of its connections."""
+        self.session.close()
+
+    def _updateRateLimit(self, route, headers):
+        """Remember when a route can be used again, if it has run out of requests.
+
+        Parameters:
+        -----------
+        route: str
+            The rate limit bucket this response belongs to.
+        headers: dict
+            The response headers.
+        """
+        if headers.get("X-RateLimit-Remaining") != "0":
+            self.resetTimes.pop(route, None)
+            return
+        if "X-RateLimit-Reset-After" in headers:
+            self.resetTimes[route] = time.time() + float(headers["X-RateLimit-Reset-After"])
+        elif "X-RateLimit-Reset" in headers:
+            self.resetTimes[route] = float(headers["X-RateLimit-Reset"])
+
+    async def request(self, method, url, body=None):
+        """Send a request to the Discord API.
+
+        Parameters:
+        -----------
+        method: str
+            The HTTP method to use, e.g. "PATCH".
+        url: str
+            The full URL of the endpoint.
+        body: dict
+            The JSON body to send, if any.
+
+        Returns:
+        --------
+        (status, data): (int, dict)
+            The HTTP status of the last attempt, and the decoded JSON response (or
+            None if the response was not JSON).
+        """
+        route = "{} {}".format(method, url)
+        headers = {"Authorization": "Bot {}".format(self.bot.settings.token),
+                   "content-type": "application/json"}
+        data = json.dumps(body) if body is not None else None
+
+        for attempt in range(REST_MAX_RETRIES):
+            delay = self.resetTimes.get(route, 0) - time.time()
+            if delay > 0:
+                LOGGER.debug("Waiting %.2fs for rate limit on %s", delay, route)
+                await asyncio.sleep(delay)
+
+            async with self.session.request(method, url, headers=headers,
+                                            data=data) as resp:
+                status = resp.status
+                text = await resp.text()
+                self._updateRateLimit(route, resp.headers)
+            LOGGER.debug("API status code: %s", status)
+            LOGGER.debug("API response: %s", text)
+
+            try:
+                respData = json.loads(text)
+            except ValueError:
+                respData = None
+
+            if status != 429:
+                return status, respData
+
+            # Rate limited, wait as long as Discord tells us to.
+            if isinstance(respData, dict) and "retry_after" in respData:
+                retryAfter = respData["retry_after"] / 1000
+            else:
+                retryAfter = 2 ** attempt
+            LOGGER.warning("Rate limited on %s, retrying in %.2fs (attempt %s/%s)",
+                           route, retryAfter, attempt + 1, REST_MAX_RETRIES)
+            await asyncio.sleep(retryAfter)
+
+        return status, respData
+
 
 class TempChannels:
     """Creates a temporary channel."""
@@ -123,54 +309,336 @@ class TempChannels:
         self.bot = bot
         self.config = config.Config("settings.json",
                                     cogname="lui-cogs/tempchannels")
-        self.lock = Lock()
+        # Server ID -> asyncio.Lock, so changes on one server don't wait on another.
+        self.locks = {}
+        self.restClient = RestClient(bot)
         self.settings = self.config.get(KEY_SETTINGS)
+        # Server IDs whose settings were changed by the background loop, but have not
+        # been written to disk yet.
+        self.dirty = set()
+        for sid in _migrateSettings(self.settings):
+            LOGGER.info("Migrated settings for server %s to schedule \"%s\"",
+                        sid, DEFAULT_SCHEDULE)
+            self.dirty.add(sid)
+
+        # Heap of (deadline, sid, schedule name), so the background loop only looks
+        # at schedules that are due.  Entries are not removed from the heap when a
+        # schedule changes, instead self.deadlines holds the only valid deadline for
+        # each (sid, schedule name) and stale heap entries are skipped.
+        self.deadlineHeap = []
+        self.deadlines = {}
+        for sid, serverSettings in self.settings.items():
+            for name in serverSettings[KEY_SCHEDULES]:
+                self._scheduleChannel(sid, name)
+
+    # Close the API session on cog unload.
+    def __unload(self): # pylint: disable=invalid-name
+        self.restClient.close()
 
     async def _syncSettings(self):
         """Force settings to file and reload"""
-        await self.config.put(KEY_SETTINGS, self.settings)
+        # Take the dirty marks before writing, so servers marked during the write are
+        # written next time instead of being forgotten.
+        dirty, self.dirty = self.dirty, set()
+        try:
+            await self.config.put(KEY_SETTINGS, self.settings)
+        except Exception:
+            self.dirty |= dirty
+            raise
         self.settings = self.config.get(KEY_SETTINGS)
 
+    async def _syncDirtySettings(self):
+        """Write settings to file only if some server's settings have changed.
+
+        All pending changes are coalesced into a single write.
+        """
+        if self.dirty:
+            LOGGER.debug("Syncing settings for %s server(s)", len(self.dirty))
+            await self._syncSettings()
+
+    def _getLock(self, sid):
+        """Get the lock that guards the settings of a server.
+
+        Parameters:
+        -----------
+        sid: str
+            The server ID.
+
+        Returns:
+        --------
+        lock: asyncio.Lock
+            The lock for this server.
+        """
+        if sid not in self.locks:
+            self.locks[sid] = asyncio.Lock()
+        return self.locks[sid]
+
+    def _selectedSchedule(self, sid):
+        """Get the schedule that the config commands currently edit on a server.
+
+        Call this with the server lock held, so a concurrent `select` cannot change
+        which schedule a command edits.
+
+        Returns (None, None) if the server has no settings or no schedule is
+        selected, otherwise (schedule name, schedule).
+        """
+        serverSettings = self.settings.get(sid)
+        if not serverSettings:
+            return None, None
+        name = serverSettings[KEY_SELECTED]
+        schedule = serverSettings[KEY_SCHEDULES].get(name)
+        return (name, schedule) if schedule is not None else (None, None)
+
+    async def _sayNoSchedule(self, ctx):
+        """Tell the user to select a schedule before changing settings."""
+        await self.bot.say(":negative_squared_cross_mark: TempChannel: No schedule is "
+                           "selected.  Please select a schedule first with "
+                           "`{0}tempchannels select`, or create one with "
+                           "`{0}tempchannels add` or `{0}tempchannels "
+                           "default`.".format(ctx.prefix))
+
+    def _scheduleChannel(self, sid, name):
+        """Compute the next deadline of a schedule, and add it to the deadline heap.
+
+        The deadline is the stop time if its channel exists, otherwise the next start
+        time.  Disabled and incomplete schedules have no deadline.
+
+        Parameters:
+        -----------
+        sid: str
+            The server ID.
+        name: str
+            The name of the schedule.
+        """
+        self.deadlines.pop((sid, name), None)
+        try:
+            properties = self.settings[sid][KEY_SCHEDULES][name]
+        except KeyError:
+            # Schedule was removed.
+            return
+
+        missing = [key for key in KEYS_REQUIRED if key not in properties]
+        if missing:
+            LOGGER.error("Keys %s are missing in schedule %s for server %s! Run "
+                         "[p]tc default first!", missing, name, sid)
+            return
+        if not properties[KEY_ENABLED]:
+            return
+
+        if properties[KEY_CH_CREATED]:
+            deadline = properties.get(KEY_STOP_TIME, 0)
+        elif not properties[KEY_CH_ID]:
+            deadline = _nextStart(properties, datetime.now())
+        else:
+            deadline = None
+
+        if deadline is not None:
+            self.deadlines[(sid, name)] = deadline
+            heapq.heappush(self.deadlineHeap, (deadline, sid, name))
+
+    async def _saveSchedule(self, sid, name):
+        """Reschedule a schedule after a config change, and save settings.
+
+        Parameters:
+        -----------
+        sid: str
+            The server ID.
+        name: str
+            The name of the changed schedule.
+        """
+        self._scheduleChannel(sid, name)
+        await self._syncSettings()
+
     @commands.group(name="tempchannels", pass_context=True, no_pm=True, aliases=["tc"])
     @checks.mod_or_permissions(manage_messages=True)
     async def tempChannels(self, ctx):
         """
-        Temporary text-channel creation (only 1 at the moment).
+        Temporary text-channel creation.
+
+        Each server can have multiple named schedules, each with its own temporary
+        channel.  The config commands edit the currently selected schedule.
         """
         if ctx.invoked_subcommand is None:
             await self.bot.send_cmd_help(ctx)
 
+    @tempChannels.command(name="add", pass_context=True, no_pm=True)
+    async def tempChannelsAdd(self, ctx, name: str):
+        """Add a new schedule with default settings, and select it.
+
+        Parameters:
+        -----------
+        name: str
+            The name of the new schedule.
+        """
+        sid = ctx.message.server.id
+        name = name.lower()
+        if len(name) > MAX_SCHEDULE_NAME:
+            await self.bot.say(":negative_squared_cross_mark: TempChannel - Add: "
+                               "Name is too long.  Try again.")
+            return
+
+        async with self._getLock(sid):
+            if sid not in self.settings:
+                self.settings[sid] = {KEY_SCHEDULES: {}, KEY_SELECTED: None}
+            schedules = self.settings[sid][KEY_SCHEDULES]
+            if name in schedules:
+                await self.bot.say(":negative_squared_cross_mark: TempChannel - Add: "
+                                   "Schedule **`{}`** already exists.".format(name))
+                return
+            if len(schedules) >= MAX_SCHEDULES:
+                await self.bot.say(":negative_squared_cross_mark: TempChannel - Add: "
+                                   "This server already has the maximum of {} "
+                                   "schedules.".format(MAX_SCHEDULES))
+                return
+            schedules[name] = deepcopy(DEFAULT_DICT)
+            self.settings[sid][KEY_SELECTED] = name
+            await self._saveSchedule(sid, name)
+        LOGGER.info("%s (%s) added schedule %s on %s (%s)",
+                    ctx.message.author.name, ctx.message.author.id,
+                    name, ctx.message.server.name, sid)
+        await self.bot.say(":white_check_mark: TempChannel - Add: Schedule **`{}`** "
+                           "added and selected.".format(name))
+
+    @tempChannels.command(name="remove", pass_context=True, no_pm=True)
+    async def tempChannelsRemove(self, ctx, name: str):
+        """Remove a schedule, and delete its channel if it exists.
+
+        Parameters:
+        -----------
+        name: str
+            The name of the schedule to remove.
+        """
+        sid = ctx.message.server.id
+        name = name.lower()
+
+        async with self._getLock(sid):
+            try:
+                properties = self.settings[sid][KEY_SCHEDULES].pop(name)
+            except KeyError:
+                await self.bot.say(":negative_squared_cross_mark: TempChannel - Remove: "
+                                   "Schedule **`{}`** does not exist.".format(name))
+                return
+            if self.settings[sid][KEY_SELECTED] == name:
+                # Select one of the remaining schedules, if any.
+                remaining = sorted(self.settings[sid][KEY_SCHEDULES])
+                self.settings[sid][KEY_SELECTED] = remaining[0] if remaining else None
+            self._scheduleChannel(sid, name)
+            await self._syncSettings()
+
+        if properties.get(KEY_CH_ID):
+            chanObj = self.bot.get_channel(properties[KEY_CH_ID])
+            if chanObj:
+                try:
+                    await self.bot.delete_channel(chanObj)
+                except discord.DiscordException:
+                    LOGGER.error("Could not delete channel!", exc_info=True)
+
+        LOGGER.info("%s (%s) removed schedule %s on %s (%s)",
+                    ctx.message.author.name, ctx.message.author.id,
+                    name, ctx.message.server.name, sid)
+        await self.bot.say(":white_check_mark: TempChannel - Remove: Schedule "
+                           "**`{}`** removed.".format(name))
+
+    @tempChannels.command(name="select", pass_context=True, no_pm=True)
+    async def tempChannelsSelect(self, ctx, name: str):
+        """Select the schedule that the config commands will edit.
+
+        Parameters:
+        -----------
+        name: str
+            The name of the schedule to select.
+        """
+        sid = ctx.message.server.id
+        name = name.lower()
+
+        async with self._getLock(sid):
+            if sid not in self.settings or \
+                    name not in self.settings[sid][KEY_SCHEDULES]:
+                await self.bot.say(":negative_squared_cross_mark: TempChannel - Select: "
+                                   "Schedule **`{}`** does not exist.".format(name))
+                return
+            self.settings[sid][KEY_SELECTED] = name
+            await self._syncSettings()
+        await self.bot.say(":white_check_mark: TempChannel - Select: Schedule **`{}`** "
+                           "selected.".format(name))
+
+    @tempChannels.command(name="list", pass_context=True, no_pm=True)
+    async def tempChannelsList(self, ctx):
+        """List the schedules on this server."""
+        sid = ctx.message.server.id
+        if sid not in self.settings or not self.settings[sid][KEY_SCHEDULES]:
+            await self.bot.say(":negative_squared_cross_mark: TempChannel: There are "
+                               "no schedules on this server.")
+            return
+
+        selected = self.settings[sid][KEY_SELECTED]
+        lines = []
+        for name, properties in sorted(self.settings[sid][KEY_SCHEDULES].items()):
+            lines.append("{} {:{width}} {}".format(
+                "*" if name == selected else " ", name,
+                "Enabled" if properties.get(KEY_ENABLED) else "Disabled",
+                width=MAX_SCHEDULE_NAME))
+        await self.bot.say(":information_source: TempChannel - Schedules (* = "
+                           "selected)\n```{}```".format("\n".join(lines)))
+
     @tempChannels.command(name="default", pass_context=True, no_pm=True)
     async def tempChannelsDefault(self, ctx):
-        """RUN FIRST: Sets default settings.
-        - Start at 00:00.
+        """RUN FIRST: Sets default settings for the selected schedule.
+        - Start at 20:00.
         - Duration of channel is 1 minute.
         - The creation and deletion of TempChannel is disabled.
         - NSFW prompt will not appear.
         - TempChannel will not be role restricted.
-        - If present, the previous TempChannel (if any) will be forgotten, and not deleted.
+        - TempChannel will be created every day of the week.
+        - Refused while the channel of the selected schedule still exists, as it would
+          be forgotten and never deleted.  Run `[p]tempchannels delete` first.
+
+        If there are no schedules on this server, a schedule called "default" is
+        created.
         """
-        with self.lock:
-            self.settings[ctx.message.server.id] = deepcopy(DEFAULT_DICT)
-            LOGGER.info("%s (%s) set defaults for %s (%s)",
+        sid = ctx.message.server.id
+        async with self._getLock(sid):
+            if sid not in self.settings:
+                self.settings[sid] = {KEY_SCHEDULES: {}, KEY_SELECTED: None}
+            if not self.settings[sid][KEY_SELECTED]:
+                self.settings[sid][KEY_SELECTED] = DEFAULT_SCHEDULE
+            name = self.settings[sid][KEY_SELECTED]
+            oldSchedule = self.settings[sid][KEY_SCHEDULES].get(name)
+            if oldSchedule and oldSchedule.get(KEY_CH_ID) and \
+                    self.bot.get_channel(oldSchedule[KEY_CH_ID]):
+                # Overwriting would forget the channel, so it would never be deleted.
+                await self.bot.say(":negative_squared_cross_mark: TempChannel: The "
+                                   "channel of schedule **`{}`** still exists.  Delete "
+                                   "it with `{}tempchannels delete` first, and then "
+                                   "try again.".format(name, ctx.prefix))
+                return
+            self.settings[sid][KEY_SCHEDULES][name] = deepcopy(DEFAULT_DICT)
+            LOGGER.info("%s (%s) set defaults for schedule %s on %s (%s)",
                         ctx.message.author.name, ctx.message.author.id,
-                        ctx.message.server.name, ctx.message.author.id)
+                        name, ctx.message.server.name, sid)
 
-            await self._syncSettings()
-        await self.bot.say(":white_check_mark: TempChannel: Setting default settings.")
+            await self._saveSchedule(sid, name)
+        await self.bot.say(":white_check_mark: TempChannel: Setting default settings "
+                           "for schedule **`{}`**.".format(name))
 
     @tempChannels.command(name="show", pass_context=True, no_pm=True)
     async def tempChannelsShow(self, ctx):
         """Show current settings."""
+        scheduleName, tempCh = self._selectedSchedule(ctx.message.server.id)
+        if tempCh is None:
+            await self._sayNoSchedule(ctx)
+            return
         try:
-            tempCh = self.settings[ctx.message.server.id]
             rolesAllow = [discord.utils.get(ctx.message.server.roles,
                                             id=rid) for rid in tempCh[KEY_ROLE_ALLOW]]
             rolesAllow = [roleName.name for roleName in rolesAllow if roleName]
             rolesDeny = [discord.utils.get(ctx.message.server.roles,
                                            id=rid) for rid in tempCh[KEY_ROLE_DENY]]
             rolesDeny = [roleName.name for roleName in rolesDeny if roleName]
+            weekdays = [WEEKDAYS[day] for day in
+                        tempCh.get(KEY_WEEKDAYS, DEFAULT_DICT[KEY_WEEKDAYS])]
             msg = (":information_source: TempChannel - Current Settings\n```"
+                   "Schedule:      {}\n"
                    "Enabled?       {}\n"
                    "NSFW Prompt:   {}\n"
                    "Roles Allowed: {}\n"
@@ -179,9 +647,11 @@ class TempChannels:
                    "Ch. Topic:     {}\n"
                    "Ch. Position:  {}\n"
                    "Ch. Category:  {}\n"
+                   "Creation Days: {}\n"
                    "Creation Time: {:002d}:{:002d}\n"
                    "Duration:      {}h {}m"
-                   "```".format("Yes" if tempCh[KEY_ENABLED] else "No",
+                   "```".format(scheduleName,
+                                "Yes" if tempCh[KEY_ENABLED] else "No",
                                 "Yes" if tempCh[KEY_NSFW] else "No",
                                 rolesAllow,
                                 rolesDeny,
@@ -190,6 +660,7 @@ class TempChannels:
                                 tempCh[KEY_CH_POS],
                                 "ID {}".format(tempCh[KEY_CH_CATEGORY]) if
                                 tempCh[KEY_CH_CATEGORY] else "(not set)",
+                                ", ".join(weekdays) if weekdays else "(none)",
                                 tempCh[KEY_START_HOUR], tempCh[KEY_START_MIN],
                                 tempCh[KEY_DURATION_HOURS], tempCh[KEY_DURATION_MINS]))
 
@@ -204,19 +675,23 @@ class TempChannels:
     @tempChannels.command(name="toggle", pass_context=True, no_pm=True)
     async def tempChannelsToggle(self, ctx):
         """Toggle the creation/deletion of the temporary channel."""
-        with self.lock:
+        sid = ctx.message.server.id
+        async with self._getLock(sid):
+            scheduleName, schedule = self._selectedSchedule(sid)
+            if schedule is None:
+                await self._sayNoSchedule(ctx)
+                return
             try:
-                sid = ctx.message.server.id
-                if self.settings[sid][KEY_ENABLED]:
-                    self.settings[sid][KEY_ENABLED] = False
+                if schedule[KEY_ENABLED]:
+                    schedule[KEY_ENABLED] = False
                     isSet = False
                 else:
-                    self.settings[sid][KEY_ENABLED] = True
+                    schedule[KEY_ENABLED] = True
                     isSet = True
             except KeyError:
-                self.settings[sid][KEY_ENABLED] = True
+                schedule[KEY_ENABLED] = True
                 isSet = True
-            await self._syncSettings()
+            await self._saveSchedule(sid, scheduleName)
         if isSet:
             LOGGER.info("%s (%s) ENABLED the temp channel for %s (%s)",
                         ctx.message.author.name, ctx.message.author.id,
@@ -231,19 +706,23 @@ class TempChannels:
     @tempChannels.command(name="nsfw", pass_context=True, no_pm=True)
     async def tempChannelsNSFW(self, ctx):
         """Toggle NSFW requirements"""
-        with self.lock:
+        sid = ctx.message.server.id
+        async with self._getLock(sid):
+            scheduleName, schedule = self._selectedSchedule(sid)
+            if schedule is None:
+                await self._sayNoSchedule(ctx)
+                return
             try:
-                sid = ctx.message.server.id
-                if self.settings[sid][KEY_NSFW]:
-                    self.settings[sid][KEY_NSFW] = False
+                if schedule[KEY_NSFW]:
+                    schedule[KEY_NSFW] = False
                     isSet = False
                 else:
-                    self.settings[sid][KEY_NSFW] = True
+                    schedule[KEY_NSFW] = True
                     isSet = True
             except KeyError:
-                self.settings[sid][KEY_NSFW] = True
+                schedule[KEY_NSFW] = True
                 isSet = True
-            await self._syncSettings()
+            await self._saveSchedule(sid, scheduleName)
         if isSet:
             LOGGER.info("%s (%s) ENABLED the NSFW prompt for %s (%s)",
                         ctx.message.author.name, ctx.message.author.id,
@@ -279,10 +758,14 @@ class TempChannels:
                                "Time: Please enter a valid time.")
             return
 
-        with self.lock:
-            self.settings[sid][KEY_START_HOUR] = hour
-            self.settings[sid][KEY_START_MIN] = minute
-            await self._syncSettings()
+        async with self._getLock(sid):
+            scheduleName, schedule = self._selectedSchedule(sid)
+            if schedule is None:
+                await self._sayNoSchedule(ctx)
+                return
+            schedule[KEY_START_HOUR] = hour
+            schedule[KEY_START_MIN] = minute
+            await self._saveSchedule(sid, scheduleName)
         LOGGER.info("%s (%s) set the start time to %002d:%002d on %s (%s)",
                     ctx.message.author.name, ctx.message.author.id,
                     hour, minute, ctx.message.server.name, sid)
@@ -305,7 +788,6 @@ class TempChannels:
         1 hour 3 minutes.
         """
         sid = ctx.message.server.id
-
         if (hours >= 100) or (hours < 0):
             await self.bot.say(":negative_squared_cross_mark: TempChannel - Duration: "
                                "Please enter valid hours!")
@@ -319,10 +801,14 @@ class TempChannels:
                                "Please enter a valid duration!")
             return
 
-        with self.lock:
-            self.settings[sid][KEY_DURATION_HOURS] = hours
-            self.settings[sid][KEY_DURATION_MINS] = minutes
-            await self._syncSettings()
+        async with self._getLock(sid):
+            scheduleName, schedule = self._selectedSchedule(sid)
+            if schedule is None:
+                await self._sayNoSchedule(ctx)
+                return
+            schedule[KEY_DURATION_HOURS] = hours
+            schedule[KEY_DURATION_MINS] = minutes
+            await self._saveSchedule(sid, scheduleName)
         LOGGER.info("%s (%s) set the duration to %s hours, %s minutes on %s (%s)",
                     ctx.message.author.name, ctx.message.author.id,
                     hours, minutes, ctx.message.server.name, sid)
@@ -339,10 +825,13 @@ class TempChannels:
             return
 
         sid = ctx.message.server.id
-
-        with self.lock:
-            self.settings[sid][KEY_CH_TOPIC] = topic
-            await self._syncSettings()
+        async with self._getLock(sid):
+            scheduleName, schedule = self._selectedSchedule(sid)
+            if schedule is None:
+                await self._sayNoSchedule(ctx)
+                return
+            schedule[KEY_CH_TOPIC] = topic
+            await self._saveSchedule(sid, scheduleName)
         LOGGER.info("%s (%s) set the channel topic to the following on %s (%s): %s",
                     ctx.message.author.name, ctx.message.author.id,
                     ctx.message.server.name, sid, topic)
@@ -359,10 +848,13 @@ class TempChannels:
             return
 
         sid = ctx.message.server.id
-
-        with self.lock:
-            self.settings[sid][KEY_CH_NAME] = name
-            await self._syncSettings()
+        async with self._getLock(sid):
+            scheduleName, schedule = self._selectedSchedule(sid)
+            if schedule is None:
+                await self._sayNoSchedule(ctx)
+                return
+            schedule[KEY_CH_NAME] = name
+            await self._saveSchedule(sid, scheduleName)
         LOGGER.info("%s (%s) set the channel name to ""%s"" on %s (%s)",
                     ctx.message.author.name, ctx.message.author.id,
                     name, ctx.message.server.name, sid)
@@ -379,10 +871,13 @@ class TempChannels:
             return
 
         sid = ctx.message.server.id
-
-        with self.lock:
-            self.settings[sid][KEY_CH_POS] = position
-            await self._syncSettings()
+        async with self._getLock(sid):
+            scheduleName, schedule = self._selectedSchedule(sid)
+            if schedule is None:
+                await self._sayNoSchedule(ctx)
+                return
+            schedule[KEY_CH_POS] = position
+            await self._saveSchedule(sid, scheduleName)
         LOGGER.info("%s (%s) changed the position to %s on %s (%s)",
                     ctx.message.author.name, ctx.message.author.id,
                     position, ctx.message.server.name, sid)
@@ -416,10 +911,13 @@ class TempChannels:
             return
 
         sid = ctx.message.server.id
-
-        with self.lock:
-            self.settings[sid][KEY_CH_CATEGORY] = categoryID
-            await self._syncSettings()
+        async with self._getLock(sid):
+            scheduleName, schedule = self._selectedSchedule(sid)
+            if schedule is None:
+                await self._sayNoSchedule(ctx)
+                return
+            schedule[KEY_CH_CATEGORY] = categoryID
+            await self._saveSchedule(sid, scheduleName)
 
         if categoryID == 0:
             LOGGER.info("%s (%s) disabled category nesting on %s (%s)",
@@ -445,19 +943,23 @@ class TempChannels:
 
         """
         sid = ctx.message.server.id
-
-        if role.id not in self.settings[sid][KEY_ROLE_ALLOW]:
-            with self.lock:
-                self.settings[sid][KEY_ROLE_ALLOW].append(role.id)
-                await self._syncSettings()
-            LOGGER.info("%s (%s) added role %s to the allow list on %s (%s)",
-                        ctx.message.author.name, ctx.message.author.id,
-                        role.name, ctx.message.server.name, sid)
-            await self.bot.say(":white_check_mark: TempChannel - Role Allow: **`{0}`"
-                               "** will be allowed access.".format(role.name))
-        else:
-            await self.bot.say(":negative_squared_cross_mark: TempChannel - Role Allow: "
-                               "**`{0}`** is already allowed.".format(role.name))
+        async with self._getLock(sid):
+            scheduleName, schedule = self._selectedSchedule(sid)
+            if schedule is None:
+                await self._sayNoSchedule(ctx)
+                return
+            if role.id in schedule[KEY_ROLE_ALLOW]:
+                await self.bot.say(":negative_squared_cross_mark: TempChannel - Role "
+                                   "Allow: **`{0}`** is already allowed."
+                                   .format(role.name))
+                return
+            schedule[KEY_ROLE_ALLOW].append(role.id)
+            await self._saveSchedule(sid, scheduleName)
+        LOGGER.info("%s (%s) added role %s to the allow list on %s (%s)",
+                    ctx.message.author.name, ctx.message.author.id,
+                    role.name, ctx.message.server.name, sid)
+        await self.bot.say(":white_check_mark: TempChannel - Role Allow: **`{0}`"
+                           "** will be allowed access.".format(role.name))
 
     @tempChannels.command(name="allowremove", pass_context=True, no_pm=True, aliases=["ar"])
     async def tempChannelsAllowRemove(self, ctx, *, role: discord.Role):
@@ -469,20 +971,24 @@ class TempChannels:
             The role you wish to remove access from.
         """
         sid = ctx.message.server.id
-
-        if not self.settings[sid][KEY_ROLE_ALLOW] or \
-                role.id not in self.settings[sid][KEY_ROLE_ALLOW]:
-            await self.bot.say(":negative_squared_cross_mark: TempChannel - Role Allow: "
-                               "**`{0}`** wasn't on the list.".format(role.name))
-        else:
-            with self.lock:
-                self.settings[sid][KEY_ROLE_ALLOW].remove(role.id)
-                await self._syncSettings()
-            LOGGER.info("%s (%s) removed role %s from the allow list on %s (%s)",
-                        ctx.message.author.name, ctx.message.author.id,
-                        role.name, ctx.message.server.name, sid)
-            await self.bot.say(":white_check_mark: TempChannel - Role Allow: **`{0}`** "
-                               "removed from the list.".format(role.name))
+        async with self._getLock(sid):
+            scheduleName, schedule = self._selectedSchedule(sid)
+            if schedule is None:
+                await self._sayNoSchedule(ctx)
+                return
+            if not schedule[KEY_ROLE_ALLOW] or \
+                    role.id not in schedule[KEY_ROLE_ALLOW]:
+                await self.bot.say(":negative_squared_cross_mark: TempChannel - Role "
+                                   "Allow: **`{0}`** wasn't on the list."
+                                   .format(role.name))
+                return
+            schedule[KEY_ROLE_ALLOW].remove(role.id)
+            await self._saveSchedule(sid, scheduleName)
+        LOGGER.info("%s (%s) removed role %s from the allow list on %s (%s)",
+                    ctx.message.author.name, ctx.message.author.id,
+                    role.name, ctx.message.server.name, sid)
+        await self.bot.say(":white_check_mark: TempChannel - Role Allow: **`{0}`** "
+                           "removed from the list.".format(role.name))
 
     @tempChannels.command(name="denyadd", pass_context=True, no_pm=True, aliases=["da"])
     async def tempChannelsDenyAdd(self, ctx, *, role: discord.Role):
@@ -497,20 +1003,23 @@ class TempChannels:
             The role you wish to deny sending permissions in the temporary channel.
         """
         sid = ctx.message.server.id
-
-        if role.id not in self.settings[sid][KEY_ROLE_DENY]:
-            with self.lock:
-                self.settings[sid][KEY_ROLE_DENY].append(role.id)
-                await self._syncSettings()
-            LOGGER.info("%s (%s) added role %s to the deny list on %s (%s)",
-                        ctx.message.author.name, ctx.message.author.id,
-                        role.name, ctx.message.server.name, sid)
-            await self.bot.say(":white_check_mark: TempChannel - Role: **`{0}`** will "
-                               "be denied message sending, provided this role is higher "
-                               "than any of the ones in the allowed list.".format(role.name))
-        else:
-            await self.bot.say(":negative_squared_cross_mark: TempChannel - Role Deny: "
-                               "**`{0}`** is already denied.".format(role))
+        async with self._getLock(sid):
+            scheduleName, schedule = self._selectedSchedule(sid)
+            if schedule is None:
+                await self._sayNoSchedule(ctx)
+                return
+            if role.id in schedule[KEY_ROLE_DENY]:
+                await self.bot.say(":negative_squared_cross_mark: TempChannel - Role "
+                                   "Deny: **`{0}`** is already denied.".format(role))
+                return
+            schedule[KEY_ROLE_DENY].append(role.id)
+            await self._saveSchedule(sid, scheduleName)
+        LOGGER.info("%s (%s) added role %s to the deny list on %s (%s)",
+                    ctx.message.author.name, ctx.message.author.id,
+                    role.name, ctx.message.server.name, sid)
+        await self.bot.say(":white_check_mark: TempChannel - Role: **`{0}`** will "
+                           "be denied message sending, provided this role is higher "
+                           "than any of the ones in the allowed list.".format(role.name))
 
     @tempChannels.command(name="denyremove", pass_context=True, no_pm=True, aliases=["dr"])
     async def tempChannelsDenyRemove(self, ctx, *, role: discord.Role):
@@ -522,184 +1031,364 @@ class TempChannels:
             The role you wish to remove from the deny list.
         """
         sid = ctx.message.server.id
+        async with self._getLock(sid):
+            scheduleName, schedule = self._selectedSchedule(sid)
+            if schedule is None:
+                await self._sayNoSchedule(ctx)
+                return
+            if not schedule[KEY_ROLE_DENY] or \
+                    role.id not in schedule[KEY_ROLE_DENY]:
+                await self.bot.say(":negative_squared_cross_mark: TempChannel - Role "
+                                   "Deny: **`{0}`** wasn't on the list."
+                                   .format(role.name))
+                return
+            schedule[KEY_ROLE_DENY].remove(role.id)
+            await self._saveSchedule(sid, scheduleName)
+        LOGGER.info("%s (%s) removed role %s from the deny list on %s (%s)",
+                    ctx.message.author.name, ctx.message.author.id,
+                    role.name, ctx.message.server.name, sid)
+        await self.bot.say(":white_check_mark: TempChannel - Role Deny: **`{0}`** "
+                           "removed from the list.".format(role.name))
 
-        if not self.settings[sid][KEY_ROLE_DENY] or \
-                role.id not in self.settings[sid][KEY_ROLE_DENY]:
-            await self.bot.say(":negative_squared_cross_mark: TempChannel - Role Deny: "
-                               "**`{0}`** wasn't on the list.".format(role.name))
-        else:
-            with self.lock:
-                self.settings[sid][KEY_ROLE_DENY].remove(role.id)
-                await self._syncSettings()
-            LOGGER.info("%s (%s) removed role %s from the deny list on %s (%s)",
-                        ctx.message.author.name, ctx.message.author.id,
-                        role.name, ctx.message.server.name, sid)
-            await self.bot.say(":white_check_mark: TempChannel - Role Deny: **`{0}`** "
-                               "removed from the list.".format(role.name))
+    @tempChannels.command(name="days", pass_context=True, no_pm=True)
+    async def tempChannelsDays(self, ctx, *days: str):
+        """Set the days of the week to create the temp channel on.
+
+        Parameters:
+        -----------
+        days: str
+            The days of the week, e.g. `mon wed fri`.  Leave empty to create the
+            channel every day.
+        """
+        days = [day.lower()[:3] for day in days]
+        invalid = [day for day in days if day not in WEEKDAYS]
+        if invalid:
+            await self.bot.say(":negative_squared_cross_mark: TempChannel - Days: "
+                               "Please use the days {}.".format(", ".join(WEEKDAYS)))
+            return
+
+        sid = ctx.message.server.id
+        weekdays = sorted({WEEKDAYS.index(day) for day in days}) if days else \
+                   list(range(len(WEEKDAYS)))
+
+        async with self._getLock(sid):
+            scheduleName, schedule = self._selectedSchedule(sid)
+            if schedule is None:
+                await self._sayNoSchedule(ctx)
+                return
+            schedule[KEY_WEEKDAYS] = weekdays
+            await self._saveSchedule(sid, scheduleName)
+        LOGGER.info("%s (%s) set the days to %s on %s (%s)",
+                    ctx.message.author.name, ctx.message.author.id,
+                    weekdays, ctx.message.server.name, sid)
+        await self.bot.say(":white_check_mark: TempChannel - Days: Channel will be "
+                           "created on: {}".format(", ".join(WEEKDAYS[day] for
+                                                             day in weekdays)))
 
     @tempChannels.command(name="delete", pass_context=True, no_pm=True)
     async def tempChannelsDelete(self, ctx):
         """Deletes the temp channel, if it exists."""
         sid = ctx.message.server.id
-        await self._syncSettings()
-        if self.settings[sid][KEY_CH_CREATED]:
-            # Channel created, see when we should delete it.
-            if self.settings[sid][KEY_CH_ID]:
-                try:
-                    chanObj = self.bot.get_channel(self.settings[sid][KEY_CH_ID])
-                    await self.bot.delete_channel(chanObj)
-                except discord.DiscordException:
-                    LOGGER.error("Could not delete channel!", exc_info=True)
-                finally:
-                    with self.lock:
-                        self.settings[sid][KEY_CH_ID] = None
-                        self.settings[sid][KEY_CH_CREATED] = False
-                        await self._syncSettings()
-                    LOGGER.info("Channel #%s (%s) in %s (%s) was deleted by %s (%s).",
-                                chanObj.name, chanObj.id,
-                                ctx.message.server.name, ctx.message.server.id,
-                                ctx.message.author.name, ctx.message.author.id)
-                await self.bot.say(":white_check_mark: TempChannel: Channel deleted")
-            else:
+        async with self._getLock(sid):
+            scheduleName, schedule = self._selectedSchedule(sid)
+            if schedule is None:
+                await self._sayNoSchedule(ctx)
+                return
+            if not schedule[KEY_CH_CREATED]:
+                await self.bot.say(":negative_squared_cross_mark: TempChannel: There is "
+                                   "no temp channel to delete!")
+                return
+            if not schedule[KEY_CH_ID]:
                 await self.bot.say(":negative_squared_cross_mark: TempChannel: No "
                                    "temporary channel to delete.")
-        else:
-            await self.bot.say(":negative_squared_cross_mark: TempChannel: There is no "
-                               "temp channel to delete!")
+                return
+            chanObj = self.bot.get_channel(schedule[KEY_CH_ID])
+            try:
+                await self.bot.delete_channel(chanObj)
+            except discord.DiscordException:
+                LOGGER.error("Could not delete channel!", exc_info=True)
+            finally:
+                schedule[KEY_CH_ID] = None
+                schedule[KEY_CH_CREATED] = False
+                await self._saveSchedule(sid, scheduleName)
+        LOGGER.info("Channel #%s (%s) in %s (%s) was deleted by %s (%s).",
+                    chanObj.name, chanObj.id,
+                    ctx.message.server.name, ctx.message.server.id,
+                    ctx.message.author.name, ctx.message.author.id)
+        await self.bot.say(":white_check_mark: TempChannel: Channel deleted")
+
+    def _createPermissions(self, serverObj, properties):
+        """Create the allow and deny permission lists for the temporary channel.
+
+        Parameters:
+        -----------
+        serverObj: discord.Server
+            The server the channel will be created in.
+        properties: dict
+            The temporary channel settings for this server.
+
+        Returns:
+        --------
+        (allowList, denyList): ([(discord.Role, discord.PermissionsOverwrite)],
+                                [(discord.Role, discord.PermissionsOverwrite)])
+            The permissions to give to the allowed and denied roles.
+        """
+        # Always allow the bot to read.
+        allowList = [(self.bot.user, PERMS_READ_Y)]
+        denyList = []
+
+        if properties[KEY_ROLE_ALLOW]:
+            # If we have allow roles, automatically deny @everyone the "Read
+            # Messages" permission.
+            denyList.append((serverObj.default_role, PERMS_READ_N))
+            allowList.extend(_createPermList(serverObj.roles,
+                                             properties[KEY_ROLE_ALLOW],
+                                             PERMS_READ_Y))
+
+        # Check for deny permissions.
+        if properties[KEY_ROLE_DENY]:
+            denyList.extend(_createPermList(serverObj.roles,
+                                            properties[KEY_ROLE_DENY],
+                                            PERMS_SEND_N))
+        return allowList, denyList
+
+    async def _createChannel(self, serverObj, properties):
+        """Create the temporary channel.
+
+        The channel is created in a single request with its overwrites, topic, NSFW
+        flag, parent category and position.  Only if that request fails do we fall
+        back to creating the channel through the library, and setting the rest with
+        follow-up requests.
+
+        Parameters:
+        -----------
+        serverObj: discord.Server
+            The server to create the channel in.
+        properties: dict
+            The temporary channel settings for this server.
+
+        Returns:
+        --------
+        chanId: str
+            The ID of the newly created channel.
+        """
+        allowList, denyList = self._createPermissions(serverObj, properties)
+
+        body = {"name": properties[KEY_CH_NAME],
+                "type": 0, # Text channel.
+                "topic": properties[KEY_CH_TOPIC],
+                "nsfw": properties[KEY_NSFW],
+                "position": properties[KEY_CH_POS],
+                "permission_overwrites": [_createOverwrite(target, perms) for
+                                          target, perms in allowList + denyList]}
+        if properties[KEY_CH_CATEGORY] != 0:
+            body["parent_id"] = str(properties[KEY_CH_CATEGORY])
+
+        status, data = await self.restClient.request("POST",
+                                                     PATH_GUILD_CH.format(serverObj.id),
+                                                     body)
+        if 200 <= status < 300 and isinstance(data, dict) and "id" in data:
+            LOGGER.info("Channel #%s (%s) in %s (%s) was created.",
+                        data["name"], data["id"], serverObj.name, serverObj.id)
+            return data["id"]
+
+        LOGGER.error("Could not create channel in one request for %s (%s), status "
+                     "code %s! Falling back to multiple requests.",
+                     serverObj.name, serverObj.id, status)
+        return await self._createChannelFallback(serverObj, properties,
+                                                 allowList, denyList)
+
+    async def _createChannelFallback(self, serverObj, properties, allowList, denyList):
+        """Create the temporary channel step by step, using the library where possible.
+
+        Parameters:
+        -----------
+        serverObj: discord.Server
+            The server to create the channel in.
+        properties: dict
+            The temporary channel settings for this server.
+        allowList: [(discord.Role, discord.PermissionsOverwrite)]
+            The permissions to give to the allowed roles.
+        denyList: [(discord.Role, discord.PermissionsOverwrite)]
+            The permissions to give to the denied roles.
+
+        Returns:
+        --------
+        chanId: str
+            The ID of the newly created channel.
+        """
+        body = {}
+        chanObj = await self.bot.create_channel(serverObj,
+                                                properties[KEY_CH_NAME],
+                                                *allowList,
+                                                *denyList)
+
+        LOGGER.info("Channel #%s (%s) in %s (%s) was created.",
+                    chanObj.name, chanObj.id,
+                    serverObj.name, serverObj.id)
+
+        if properties[KEY_NSFW]:
+            body["nsfw"] = True
+
+        if properties[KEY_CH_CATEGORY] != 0:
+            body["parent_id"] = properties[KEY_CH_CATEGORY]
+
+        if body:
+            # Set nsfw and/or arent category. Must use this method
+            # because this version of the discord.py library does not
+            # have a method for this yet.
+            await self.restClient.request("PATCH", PATH_CH.format(chanObj.id), body)
+
+        # Change topic.
+        await self.bot.edit_channel(chanObj,
+                                    topic=properties[KEY_CH_TOPIC],
+                                    name=properties[KEY_CH_NAME])
+
+        # Move channel position.
+        try:
+            await self.bot.move_channel(chanObj, properties[KEY_CH_POS])
+        except discord.DiscordException:
+            LOGGER.error("Could not move channel position for %s (%s)!",
+                         serverObj.name, serverObj.id, exc_info=True)
+
+        return chanObj.id
+
+    async def _processSchedule(self, sid, name):
+        """Create or delete the channel of a schedule that is due.
+
+        Parameters:
+        -----------
+        sid: str
+            The server ID.
+        name: str
+            The name of the schedule.
+        """
+        serverObj = self.bot.get_server(sid)
+        properties = self.settings[sid][KEY_SCHEDULES][name]
+
+        if not properties[KEY_CH_CREATED] and not properties[KEY_CH_ID]:
+            # It is the starting time, and the channel doesn't exist yet.  Create a
+            # channel, and then store the following in the settings:
+            # - Channel ID.
+            # - Time to delete channel.
+            properties[KEY_CH_ID] = await self._createChannel(serverObj, properties)
+            self.dirty.add(sid)
+
+            # Set delete times, and save settings.
+            duration = (properties[KEY_DURATION_HOURS] * 60 * 60 +
+                        properties[KEY_DURATION_MINS] * 60)
+            properties[KEY_STOP_TIME] = time.time() + duration
+            properties[KEY_CH_CREATED] = True
+
+        elif properties[KEY_CH_CREATED] and time.time() >= properties[KEY_STOP_TIME]:
+            # Channel created, and it is time to delete it.
+            chanObj = self.bot.get_channel(properties[KEY_CH_ID])
+            properties[KEY_CH_ID] = None
+            properties[KEY_CH_CREATED] = False
+            self.dirty.add(sid)
+
+            if chanObj:
+                await self.bot.delete_channel(chanObj)
+                LOGGER.info("Channel #%s (%s) in %s (%s) was deleted.",
+                            chanObj.name, chanObj.id,
+                            serverObj.name, serverObj.id)
+
+    def _popDueSchedules(self):
+        """Remove all due entries from the deadline heap, and return their schedules.
+
+        The deadlines themselves are kept, so _isDue() can check them again under
+        the server lock.
+
+        Returns:
+        --------
+        due: [(str, str)]
+            The (sid, schedule name) of each due schedule.
+        """
+        now = time.time()
+        due = []
+        while self.deadlineHeap and self.deadlineHeap[0][0] <= now:
+            deadline, sid, name = heapq.heappop(self.deadlineHeap)
+            if self.deadlines.get((sid, name)) != deadline or (sid, name) in due:
+                # Stale entry, this schedule was changed or already processed.
+                continue
+            due.append((sid, name))
+        return due
+
+    def _isDue(self, sid, name):
+        """Check that a schedule still exists, is enabled, and is due.
+
+        Must be called with the server lock held, as a config command may have
+        changed the schedule after it was taken off the deadline heap.
+
+        Parameters:
+        -----------
+        sid: str
+            The server ID.
+        name: str
+            The name of the schedule.
+
+        Returns:
+        --------
+        bool
+            True if the schedule should be processed now.
+        """
+        properties = self.settings.get(sid, {}).get(KEY_SCHEDULES, {}).get(name)
+        if not properties or not properties.get(KEY_ENABLED):
+            return False
+        deadline = self.deadlines.get((sid, name))
+        return deadline is not None and deadline <= time.time()
+
+    async def _processServer(self, sid, names, semaphore):
+        """Process all due schedules on a server.
+
+        Parameters:
+        -----------
+        sid: str
+            The server ID.
+        names: [str]
+            The names of the due schedules on this server.
+        semaphore: asyncio.Semaphore
+            Limits the number of servers processed at once.
+        """
+        async with semaphore:
+            async with self._getLock(sid):
+                for name in names:
+                    if not self._isDue(sid, name):
+                        # Removed, disabled or rescheduled while waiting for the lock.
+                        continue
+                    try:
+                        await self._processSchedule(sid, name)
+                    except Exception: # pylint: disable=broad-except
+                        LOGGER.error("Something went terribly wrong for schedule %s on "
+                                     "server %s!", name, sid, exc_info=True)
+                    finally:
+                        self._scheduleChannel(sid, name)
 
     ###################
     # Background Loop #
     ###################
-    async def checkChannels(self): # pylint: disable=too-many-branches,too-many-statements
-        """Loop to check whether or not we should create/delete the TempChannel"""
+    async def checkChannels(self):
+        """Loop to check whether or not we should create/delete the TempChannels"""
         while self == self.bot.get_cog("TempChannels"):
             await asyncio.sleep(SLEEP_TIME)
-            # Create/maintain the channel during a valid time and duration, else
-            # delete it.
-            with self.lock:
-                for sid, properties in self.settings.items():
-                    try:
-                        serverObj = self.bot.get_server(sid)
-
-                        missing = False
-
-                        for key in KEYS_REQUIRED:
-                            if key not in properties.keys():
-                                missing = True
-                                LOGGER.error("Key %s is missing in settings for server "
-                                             "%s (%s)! Run [p]tc default first!",
-                                             key, serverObj.name, serverObj.id)
-
-                        if missing or not properties[KEY_ENABLED]:
-                            continue
-
-                        if int(time.strftime("%H")) == properties[KEY_START_HOUR] and \
-                                int(time.strftime("%M")) == properties[KEY_START_MIN] and \
-                                not properties[KEY_CH_CREATED] and \
-                                not properties[KEY_CH_ID]:
-                            # See if ALL of the following is satisfied.
-                            # - It is the starting time.
-                            # - The channel creation flag is not set.
-                            # - The channel ID doesn't exist.
-                            #
-                            # If it is satisfied, let's create a channel, and then
-                            # store the following in the settings:
-                            # - Channel ID.
-                            # - Time to delete channel.
-                            # Start with permissions
-
-                            apiHeader = {"Authorization": "Bot {}".format(self.bot.settings.token),
-                                         "content-type": "application/json"}
-                            # Always allow the bot to read.
-                            allowList = [(self.bot.user, PERMS_READ_Y)]
-                            denyList = []
-                            body = {}
-
-                            if properties[KEY_ROLE_ALLOW]:
-                            # If we have allow roles, automatically deny @everyone the "Read
-                            # Messages" permission.
-                                denyList.append((serverObj.default_role,
-                                                 PERMS_READ_N))
-                                allowList.extend(_createPermList(serverObj.roles,
-                                                                 properties[KEY_ROLE_ALLOW],
-                                                                 PERMS_READ_Y))
-
-                            # Check for deny permissions.
-                            if properties[KEY_ROLE_DENY]:
-                                denyList.extend(_createPermList(serverObj.roles,
-                                                                properties[KEY_ROLE_DENY],
-                                                                PERMS_SEND_N))
-
-                            chanObj = await self.bot.create_channel(serverObj,
-                                                                    properties[KEY_CH_NAME],
-                                                                    *list(allowList),
-                                                                    *list(denyList))
-
-                            properties[KEY_CH_ID] = chanObj.id
-
-                            LOGGER.info("Channel #%s (%s) in %s (%s) was created.",
-                                        chanObj.name, chanObj.id,
-                                        serverObj.name, serverObj.id)
-
-                            if properties[KEY_NSFW]:
-                                body["nsfw"] = True
-
-                            if properties[KEY_CH_CATEGORY] != 0:
-                                body["parent_id"] = properties[KEY_CH_CATEGORY]
-
-                            if body:
-                                # Set nsfw and/or arent category. Must use this method
-                                # because this version of the discord.py library does not
-                                # have a method for this yet.
-                                async with aiohttp.ClientSession() as session:
-                                    async with session.patch(PATH_CH.format(chanObj.id),
-                                                             headers=apiHeader,
-                                                             data=json.dumps(body)) as resp:
-                                        LOGGER.debug("API status code: %s", resp.status)
-                                        LOGGER.debug("API response: %s", await resp.text())
-
-                            # Change topic.
-                            await self.bot.edit_channel(chanObj,
-                                                        topic=properties[KEY_CH_TOPIC],
-                                                        name=properties[KEY_CH_NAME])
-
-                            # Move channel position.
-                            try:
-                                await self.bot.move_channel(chanObj,
-                                                            properties[KEY_CH_POS])
-                            except discord.DiscordException:
-                                LOGGER.error("Could not move channel position for %s (%s)!",
-                                             serverObj.name, serverObj.id, exc_info=True)
-
-                            # Set delete times, and save settings.
-                            duration = (properties[KEY_DURATION_HOURS] * 60 * 60 +
-                                        properties[KEY_DURATION_MINS] * 60)
-                            properties[KEY_STOP_TIME] = time.time() + duration
-                            properties[KEY_CH_CREATED] = True
-
-                        elif properties[KEY_CH_CREATED]:
-                            # Channel created, see when we should delete it.
-                            if time.time() >= properties[KEY_STOP_TIME]:
-                                chanObj = self.bot.get_channel(properties[KEY_CH_ID])
-                                properties[KEY_CH_ID] = None
-                                properties[KEY_CH_CREATED] = False
-
-                                if chanObj:
-                                    await self.bot.delete_channel(chanObj)
-
-                                LOGGER.info("Channel #%s (%s) in %s (%s) was deleted.",
-                                            chanObj.name, chanObj.id,
-                                            serverObj.name, serverObj.id)
-                        await self._syncSettings()
-                    except Exception: # pylint: disable=broad-except
-                        LOGGER.error("Something went terribly wrong for server %s (%s)!",
-                                     exc_info=True)
+            # Create the channels of schedules that have reached their start time, and
+            # delete those that have reached their stop time.  Only due schedules are
+            # looked at, and servers are processed concurrently so that one slow
+            # server does not hold up the others.
+            dueServers = {}
+            for sid, name in self._popDueSchedules():
+                dueServers.setdefault(sid, []).append(name)
+            if dueServers:
+                semaphore = asyncio.Semaphore(MAX_CONCURRENT_SERVERS)
+                await asyncio.gather(*[self._processServer(sid, names, semaphore)
+                                       for sid, names in dueServers.items()])
+            # Write all of this tick's changes at once, and only if there were any.
+            await self._syncDirtySettings()
 
 def setup(bot):
     """Add the cog to the bot."""
     global LOGGER # pylint: disable=global-statement
     checkFilesystem()
-    tempchannels = TempChannels(bot)
     LOGGER = logging.getLogger("red.TempChannels")
     if LOGGER.level == 0:
         # Prevents the LOGGER from being loaded again in case of module reload.
@@ -710,5 +1399,6 @@ def setup(bot):
         handler.setFormatter(logging.Formatter("%(asctime)s %(message)s",
                                                datefmt="[%d/%m/%Y %H:%M:%S]"))
         LOGGER.addHandler(handler)
+    tempchannels = TempChannels(bot)
     bot.add_cog(tempchannels)
     bot.loop.create_task(tempchannels.checkChannels())
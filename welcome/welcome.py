@@ -4,6 +4,9 @@ Sends welcome DMs to users that join the server.
 
 import os
 import logging
+import asyncio
+from collections import deque
+import time
 import discord
 from discord.ext import commands
 from __main__ import send_cmd_help # pylint: disable=no-name-in-module
@@ -21,6 +24,25 @@ LOGGER = None
 SAVE_FOLDER = "data/lui-cogs/welcome/" #Path to save folder.
 SAVE_FILE = "settings.json"
 
+QUEUE_SIZE = 1000 # Max number of messages waiting to be sent, the rest are dropped.
+NUM_WORKERS = 3 # Number of tasks sending messages from the queue.
+MAX_RETRIES = 3 # Max number of attempts to send a message.
+RETRY_BACKOFF = 2 # Base delay in seconds between attempts, doubled every retry.
+ROUTE_INTERVAL = 1.2 # Min time in seconds between messages to the same channel or user.
+MAX_ROUTES = 1000 # Prune the per-route send times when there are more than this.
+SUMMARY_INTERVAL = 10 # Time in seconds between log summaries, if enabled.
+SUMMARY_MAX_EVENTS = 20 # Send a log summary early if it has this many events.
+MAX_MESSAGE_LENGTH = 2000
+SAVE_DELAY = 5 # Time in seconds to wait before writing changed settings to disk.
+
+LOG_JOIN = (":o: ``Server Welcome:`` User {0.name}#{0.discriminator} ({0.id}) has "
+            "joined. DM sent.")
+LOG_JOIN_FAIL = (":bangbang: ``Server Welcome:`` User {0.name}#{0.discriminator} "
+                 "({0.id}) has joined.  Could not send DM!")
+LOG_JOIN_FAIL_SUMMARY = LOG_JOIN_FAIL + " ({1})" # Keep the error on the same line.
+LOG_LEAVE = (":x: ``Server Leave  :`` User {0.name}#{0.discriminator} ({0.id}) has "
+             "left the server.")
+
 def checkFolder():
     """Used to create the data folder at first startup"""
     if not os.path.exists(SAVE_FOLDER):
@@ -35,6 +57,34 @@ def checkFiles():
         print("Creating default welcome settings.json...")
         dataIO.save_json(theFile, {})
 
+class Delivery: # pylint: disable=too-few-public-methods
+    """A message waiting in the delivery queue."""
+
+    def __init__(self, destination, content=None, embed=None,
+                 onSuccess=None, onFailure=None):
+        """
+        Parameters:
+        -----------
+        destination: discord.Channel or discord.User
+            Where to send the message.
+        content: str
+            The text of the message, if any.
+        embed: discord.Embed
+            The embed of the message, if any.
+        onSuccess: callable()
+            Called after the message is sent.
+        onFailure: callable(Exception)
+            Called with the last error if the message could not be sent.
+        """
+        self.destination = destination
+        self.content = content
+        self.embed = embed
+        self.onSuccess = onSuccess
+        self.onFailure = onFailure
+        self.attempts = 0 # Failed attempts so far.
+        # True if this is the next message for its route, see Welcome._takeRoute.
+        self.released = False
+
 class Welcome: # pylint: disable=too-many-instance-attributes
     """Send a welcome DM on server join."""
 
@@ -61,64 +111,405 @@ class Welcome: # pylint: disable=too-many-instance-attributes
 
         self.keyLeaveLogEnabled = "leaveLogEnabled"
         self.keyLeaveLogChannel = "leaveLogChannel"
+        self.keyLogSummaryEnabled = "logSummaryEnabled"
 
         checkFolder()
         checkFiles()
         self.loadSettings()
+        # Server ID -> compiled welcome template, see getTemplate().
+        self.templates = {}
+        # Pending write of changed settings to disk.
+        self.saveTask = None
+
+        # Messages are sent from a queue by a few workers, so a join raid cannot fire
+        # thousands of sends at once.  At most QUEUE_SIZE messages are pending,
+        # whether queued, waiting for their route, or waiting to be retried.
+        self.queue = asyncio.Queue()
+        self.pending = 0
+        self.routeTimes = {} # Channel/user ID -> earliest time to send to it again.
+        # Channel/user ID -> deque of deliveries waiting for that route, so workers
+        # never sleep on a busy route.
+        self.routeWaiting = {}
+        self.releaseTimers = {} # Channel/user ID -> timer releasing the next delivery.
+        self.retryTimers = set()
+        self.deliveryStats = {"queued": 0, "sent": 0, "retried": 0, "failed": 0, "dropped": 0}
+        self.workers = [self.bot.loop.create_task(self.deliveryWorker())
+                        for _ in range(NUM_WORKERS)]
+        # Log channel ID -> (channel, [log lines]) waiting to be sent as one summary.
+        self.logBuffers = {}
+        self.workers.append(self.bot.loop.create_task(self.summaryLoop()))
+
+    # Stop the workers, send buffered log summaries, and write any pending settings
+    # changes on cog unload.
+    def __unload(self): # pylint: disable=invalid-name
+        for worker in self.workers:
+            worker.cancel()
+        for timer in list(self.releaseTimers.values()) + list(self.retryTimers):
+            timer.cancel()
+        summaries = [self._popSummary(channelId) for channelId in list(self.logBuffers)]
+        if summaries:
+            self.bot.loop.create_task(self._sendSummaries(summaries))
+        if self.saveTask and not self.saveTask.done():
+            self.saveTask.cancel()
+            self.saveSettings()
+
+    def getTemplate(self, serverId):
+        """Get the compiled welcome template of a server.
+
+        The template holds everything join and leave handling needs, so it does not
+        have to look at the settings.  It is built on first use, and rebuilt after
+        the settings of the server change.
+
+        Parameters:
+        -----------
+        serverId: str
+            The server ID.
+
+        Returns:
+        --------
+        template: dict
+            The compiled template, or None if the server is not configured.
+        """
+        template = self.templates.get(serverId)
+        if template is None and serverId in self.settings:
+            template = self._buildTemplate(self.settings[serverId])
+            self.templates[serverId] = template
+        return template
+
+    def _buildTemplate(self, serverSettings):
+        """Build the welcome template of a server from its settings.
+
+        Parameters:
+        -----------
+        serverSettings: dict
+            The settings of the server.
+
+        Returns:
+        --------
+        template: dict
+            The welcome embed (None if DMs are disabled), the log channel IDs for
+            joins and leaves (None if logging is disabled), whether log summaries
+            are enabled, and the log formats.
+        """
+        welcomeEmbed = None
+        if serverSettings.get(self.keyWelcomeDMEnabled):
+            welcomeEmbed = discord.Embed(title=serverSettings.get(self.keyWelcomeTitle))
+            welcomeEmbed.description = serverSettings.get(self.keyWelcomeMessage)
+            welcomeEmbed.colour = discord.Colour.red()
+            imageUrl = serverSettings.get(self.keyWelcomeImage)
+            if imageUrl:
+                welcomeEmbed.set_image(url=imageUrl.replace(" ", "%20"))
+
+        summary = bool(serverSettings.get(self.keyLogSummaryEnabled))
+        return {"embed": welcomeEmbed,
+                "joinChannel": serverSettings.get(self.keyWelcomeLogChannel) if
+                               serverSettings.get(self.keyWelcomeLogEnabled) else None,
+                "leaveChannel": serverSettings.get(self.keyLeaveLogChannel) if
+                                serverSettings.get(self.keyLeaveLogEnabled) else None,
+                "summary": summary,
+                "joinFormat": LOG_JOIN,
+                "joinFailFormat": LOG_JOIN_FAIL_SUMMARY if summary else LOG_JOIN_FAIL,
+                "leaveFormat": LOG_LEAVE}
+
+    def settingsChanged(self, serverId):
+        """Rebuild a server's template on next use, and write settings to disk soon.
+
+        Settings are written behind, so several changes in a row cause one write.
+
+        Parameters:
+        -----------
+        serverId: str
+            The ID of the server whose settings changed.
+        """
+        self.templates.pop(serverId, None)
+        if not self.saveTask or self.saveTask.done():
+            self.saveTask = self.bot.loop.create_task(self._saveLater())
+
+    async def _saveLater(self):
+        """Write settings to disk after SAVE_DELAY seconds."""
+        await asyncio.sleep(SAVE_DELAY)
+        self.saveSettings()
+
+    def logEvent(self, serverId, channel, line):
+        """Send a line to a log channel, or buffer it if log summaries are enabled.
+
+        Parameters:
+        -----------
+        serverId: str
+            The ID of the server the event happened in.
+        channel: discord.Channel
+            The log channel, or None if it was deleted.
+        line: str
+            The log line.
+        """
+        if channel is None:
+            return
+        if not self.getTemplate(serverId)["summary"]:
+            self.enqueue(Delivery(channel, line))
+            return
+
+        lines = self.logBuffers.setdefault(channel.id, (channel, []))[1]
+        lines.append(line)
+        if len(lines) >= SUMMARY_MAX_EVENTS:
+            self.flushLog(channel.id)
+
+    def flushLog(self, channelId):
+        """Send the buffered lines of a log channel as one summary.
+
+        The summary is split into multiple messages only if it is too long.
+
+        Parameters:
+        -----------
+        channelId: str
+            The ID of the log channel.
+        """
+        channel, messages = self._popSummary(channelId)
+        for message in messages:
+            self.enqueue(Delivery(channel, message))
+
+    def _popSummary(self, channelId):
+        """Take the buffered lines of a log channel, joined into summary messages.
+
+        Parameters:
+        -----------
+        channelId: str
+            The ID of the log channel.
+
+        Returns:
+        --------
+        (channel, messages): (discord.Channel, list)
+            The log channel, and the messages to send to it.
+        """
+        channel, lines = self.logBuffers.pop(channelId, (None, []))
+        messages = []
+        message = ""
+        for line in lines:
+            line = line[:MAX_MESSAGE_LENGTH]
+            if message and len(message) + len(line) + 1 > MAX_MESSAGE_LENGTH:
+                messages.append(message)
+                message = ""
+            message = "{}\n{}".format(message, line) if message else line
+        if message:
+            messages.append(message)
+        return channel, messages
+
+    async def _sendSummaries(self, summaries):
+        """Send the last log summaries on cog unload, when the workers are stopped.
+
+        Parameters:
+        -----------
+        summaries: list
+            (channel, messages) pairs, see _popSummary().
+        """
+        for channel, messages in summaries:
+            for message in messages:
+                try:
+                    await self.bot.send_message(channel, message)
+                except discord.HTTPException:
+                    LOGGER.error("Could not send log summary to %s", channel,
+                                 exc_info=True)
+
+    async def summaryLoop(self):
+        """Send the buffered log summaries every SUMMARY_INTERVAL seconds."""
+        while True:
+            await asyncio.sleep(SUMMARY_INTERVAL)
+            for channelId in list(self.logBuffers):
+                self.flushLog(channelId)
+
+    def enqueue(self, delivery):
+        """Queue a message to be sent, or drop it if the queue is full.
+
+        Parameters:
+        -----------
+        delivery: Delivery
+            The message to send.
+        """
+        if self.pending < QUEUE_SIZE:
+            self.pending += 1
+            self.queue.put_nowait(delivery)
+            self.deliveryStats["queued"] += 1
+        else:
+            self.deliveryStats["dropped"] += 1
+            LOGGER.warning("Delivery queue is full, dropped a message to %s (%s total "
+                           "dropped)", delivery.destination, self.deliveryStats["dropped"])
+
+    def _takeRoute(self, delivery):
+        """Reserve the route of a delivery if it may be sent now, or set it aside.
+
+        Deliveries to a busy channel or user wait in a per-route deque, and are put
+        back on the queue one at a time, ROUTE_INTERVAL seconds apart.  This way a
+        busy log channel does not hold up DMs to other users.
+
+        Parameters:
+        -----------
+        delivery: Delivery
+            The message to send.
+
+        Returns:
+        --------
+        bool
+            True if the delivery should be sent now, False if it was set aside.
+        """
+        routeId = delivery.destination.id
+        now = time.time()
+        if len(self.routeTimes) > MAX_ROUTES:
+            self.routeTimes = {route: nextTime for route, nextTime in
+                               self.routeTimes.items() if nextTime > now or
+                               route in self.routeWaiting}
+
+        waiting = self.routeWaiting.get(routeId)
+        if waiting and not delivery.released:
+            # Keep the order of messages to the same route.
+            waiting.append(delivery)
+            return False
+
+        nextTime = self.routeTimes.get(routeId, 0)
+        if nextTime > now:
+            waiting = self.routeWaiting.setdefault(routeId, deque())
+            if delivery.released:
+                waiting.appendleft(delivery)
+            else:
+                waiting.append(delivery)
+            delivery.released = False
+            self._scheduleRelease(routeId, nextTime - now)
+            return False
+
+        delivery.released = False
+        self.routeTimes[routeId] = now + ROUTE_INTERVAL
+        if routeId in self.routeWaiting:
+            self._scheduleRelease(routeId, ROUTE_INTERVAL)
+        return True
+
+    def _scheduleRelease(self, routeId, delay):
+        """Put the next waiting delivery of a route back on the queue after delay."""
+        if routeId not in self.releaseTimers:
+            self.releaseTimers[routeId] = self.bot.loop.call_later(
+                delay, self._releaseRoute, routeId)
+
+    def _releaseRoute(self, routeId):
+        """Put the next waiting delivery of a route back on the queue."""
+        self.releaseTimers.pop(routeId, None)
+        waiting = self.routeWaiting.get(routeId)
+        if not waiting:
+            return
+        delivery = waiting.popleft()
+        if not waiting:
+            del self.routeWaiting[routeId]
+        delivery.released = True
+        self.queue.put_nowait(delivery)
+
+    def _retry(self, delivery, timer):
+        """Put a delivery back on the queue after a failed attempt."""
+        self.retryTimers.discard(timer)
+        delivery.released = True
+        self.queue.put_nowait(delivery)
+
+    def _finish(self, delivery, error=None):
+        """Count a delivery as sent, or as failed with error, and run its callback."""
+        self.pending -= 1
+        if error is None:
+            self.deliveryStats["sent"] += 1
+            if delivery.onSuccess:
+                delivery.onSuccess()
+        else:
+            self.deliveryStats["failed"] += 1
+            if delivery.onFailure:
+                delivery.onFailure(error)
+
+    async def _deliver(self, delivery):
+        """Make one attempt to send a queued message.
+
+        If its route is busy, the message is set aside until the route is free.  When
+        rate limited or on Discord errors, it is retried after a backoff, up to
+        MAX_RETRIES attempts.  Neither blocks the worker.
+
+        Parameters:
+        -----------
+        delivery: Delivery
+            The message to send.
+        """
+        try:
+            if not self._takeRoute(delivery):
+                return
+            await self.bot.send_message(delivery.destination, delivery.content,
+                                        embed=delivery.embed)
+        except discord.Forbidden as error:
+            self._finish(delivery, error)
+        except discord.HTTPException as error:
+            status = getattr(error.response, "status", 0)
+            delivery.attempts += 1
+            if (status != 429 and status < 500) or delivery.attempts >= MAX_RETRIES:
+                self._finish(delivery, error)
+                return
+            self.deliveryStats["retried"] += 1
+            timer = self.bot.loop.call_later(RETRY_BACKOFF * 2 ** (delivery.attempts - 1),
+                                             lambda: self._retry(delivery, timer))
+            self.retryTimers.add(timer)
+        except Exception as error: # pylint: disable=broad-except
+            LOGGER.error("Could not deliver message to %s", delivery.destination,
+                         exc_info=True)
+            self._finish(delivery, error)
+        else:
+            self._finish(delivery)
+
+    async def deliveryWorker(self):
+        """Send messages from the delivery queue, one at a time."""
+        while True:
+            delivery = await self.queue.get()
+            try:
+                await self._deliver(delivery)
+            except Exception: # pylint: disable=broad-except
+                LOGGER.error("Could not deliver message to %s", delivery.destination,
+                             exc_info=True)
+            finally:
+                self.queue.task_done()
 
     #The async function that is triggered on new member join.
     async def sendWelcomeMessage(self, newUser, test=False):
-        """Sends the welcome message in DM."""
+        """Queues the welcome message in DM."""
 
         serverId = newUser.server.id
+        template = self.getTemplate(serverId)
         #Do not send DM if it is disabled!
-        if not self.settings[serverId][self.keyWelcomeDMEnabled]:
+        if not template or not template["embed"]:
             return
 
-        try:
-            welcomeEmbed = discord.Embed(title=self.settings[serverId][self.keyWelcomeTitle])
-            welcomeEmbed.description = self.settings[serverId][self.keyWelcomeMessage]
-            welcomeEmbed.colour = discord.Colour.red()
-            if self.keyWelcomeImage in self.settings[serverId].keys() and \
-                    self.settings[serverId][self.keyWelcomeImage]:
-                imageUrl = self.settings[serverId][self.keyWelcomeImage]
-                welcomeEmbed.set_image(url=imageUrl.replace(" ", "%20"))
-            await self.bot.send_message(newUser, embed=welcomeEmbed)
-        except (discord.Forbidden, discord.HTTPException) as errorMsg:
-            LOGGER.error("Could not send message, the user may have"
-                         "turned off DM's from this server."
-                         " Also, make sure the server has a title "
-                         "and message set!", exc_info=True)
-            LOGGER.error(errorMsg)
-            if self.settings[serverId][self.keyWelcomeLogEnabled] and not test:
-                channel = self.bot.get_channel(self.settings[serverId][self.keyWelcomeLogChannel])
-                await self.bot.send_message(channel,
-                                            ":bangbang: ``Server Welcome:`` User "
-                                            "{0.name}#{0.discriminator} ({0.id}) has"
-                                            " joined.  Could not send DM!".format(
-                                                newUser))
-                await self.bot.send_message(channel, errorMsg)
-        else:
-            if self.settings[serverId][self.keyWelcomeLogEnabled] and not test:
-                channel = self.bot.get_channel(self.settings[serverId][self.keyWelcomeLogChannel])
-                await self.bot.send_message(channel,
-                                            ":o: ``Server Welcome:`` User {0.name}#"
-                                            "{0.discriminator} ({0.id}) has joined. "
-                                            "DM sent.".format(newUser))
+        channel = None
+        if template["joinChannel"] and not test:
+            channel = self.bot.get_channel(template["joinChannel"])
+
+        def onSuccess():
+            if channel:
+                self.logEvent(serverId, channel, template["joinFormat"].format(newUser))
                 LOGGER.info("User %s#%s (%s) has joined.  DM sent.",
                             newUser.name,
                             newUser.discriminator,
                             newUser.id)
 
+        def onFailure(errorMsg):
+            LOGGER.error("Could not send message, the user may have"
+                         "turned off DM's from this server."
+                         " Also, make sure the server has a title "
+                         "and message set!")
+            LOGGER.error(errorMsg)
+            if not channel:
+                return
+            self.logEvent(serverId, channel,
+                          template["joinFailFormat"].format(newUser, errorMsg))
+            if not template["summary"]:
+                self.logEvent(serverId, channel, str(errorMsg))
+
+        self.enqueue(Delivery(newUser, embed=template["embed"],
+                              onSuccess=onSuccess, onFailure=onFailure))
+
     async def logServerLeave(self, leaveUser):
         """Logs the server leave to a channel, if enabled."""
         serverId = leaveUser.server.id
-        if self.settings[serverId][self.keyLeaveLogEnabled]:
-            channel = self.bot.get_channel(self.settings[serverId][self.keyLeaveLogChannel])
-            await self.bot.send_message(channel,
-                                        ":x: ``Server Leave  :`` User {0.name}#"
-                                        "{0.discriminator} ({0.id}) has left the "
-                                        "server.".format(leaveUser))
+        template = self.getTemplate(serverId)
+        if template and template["leaveChannel"]:
+            channel = self.bot.get_channel(template["leaveChannel"])
+            if channel:
+                self.logEvent(serverId, channel, template["leaveFormat"].format(leaveUser))
             LOGGER.info("User %s#%s (%s) has left the server.",
                         leaveUser.name,
                         leaveUser.discriminator,
@@ -156,7 +547,6 @@ class Welcome: # pylint: disable=too-many-instance-attributes
             return
 
         try:
-            self.loadSettings()
             if ctx.message.author.server.id in self.settings:
                 self.settings[ctx.message.author.server.id] \
                     [self.keyWelcomeMessage] = message.content
@@ -164,7 +554,7 @@ class Welcome: # pylint: disable=too-many-instance-attributes
                 self.settings[ctx.message.author.server.id] = {}
                 self.settings[ctx.message.author.server.id] \
                     [self.keyWelcomeMessage] = message.content
-            self.saveSettings()
+            self.settingsChanged(ctx.message.author.server.id)
         except Exception as errorMsg: # pylint: disable=broad-except
             await self.bot.say("Could not save settings! Check the console for "
                                "details.")
@@ -183,7 +573,6 @@ class Welcome: # pylint: disable=too-many-instance-attributes
     @checks.serverowner() #Only allow server owner to execute the following command.
     async def toggledm(self, ctx):
         """Toggle sending a welcome DM."""
-        self.loadSettings()
         try:
             if self.settings[ctx.message.author.server.id][self.keyWelcomeDMEnabled]:
                 self.settings[ctx.message.author.server.id][self.keyWelcomeDMEnabled] = False
@@ -194,7 +583,7 @@ class Welcome: # pylint: disable=too-many-instance-attributes
         except KeyError:
             self.settings[ctx.message.author.server.id][self.keyWelcomeDMEnabled] = True
             isSet = True
-        self.saveSettings()
+        self.settingsChanged(ctx.message.author.server.id)
         if isSet:
             await self.bot.say(":white_check_mark: Server Welcome - DM: Enabled.")
             LOGGER.info("Message toggle ENABLED by %s#%s (%s)",
@@ -214,7 +603,6 @@ class Welcome: # pylint: disable=too-many-instance-attributes
     @checks.serverowner() #Only allow server owner to execute the following command.
     async def toggleLog(self, ctx):
         """Toggle sending logs to a channel."""
-        self.loadSettings()
 
         #If no channel is set, send error.
         if not self.settings[ctx.message.author.server.id][self.keyWelcomeLogChannel] \
@@ -236,7 +624,7 @@ class Welcome: # pylint: disable=too-many-instance-attributes
             self.settings[ctx.message.author.server.id][self.keyLeaveLogEnabled] = True
             isSet = True
 
-        self.saveSettings()
+        self.settingsChanged(ctx.message.author.server.id)
         if isSet:
             await self.bot.say(":white_check_mark: Server Welcome/Leave - Logging: "
                                "Enabled.")
@@ -252,12 +640,42 @@ class Welcome: # pylint: disable=too-many-instance-attributes
                         ctx.message.author.discriminator,
                         ctx.message.author.id)
 
+    #[p]welcome togglesummary
+    @_welcome.command(pass_context=True, no_pm=False, name="togglesummary")
+    @checks.serverowner() #Only allow server owner to execute the following command.
+    async def toggleSummary(self, ctx):
+        """Toggle sending joins and leaves to the log channel as periodic summaries."""
+        serverId = ctx.message.author.server.id
+        try:
+            isSet = not self.settings[serverId].get(self.keyLogSummaryEnabled, False)
+            self.settings[serverId][self.keyLogSummaryEnabled] = isSet
+        except KeyError:
+            await self.bot.say(":negative_squared_cross_mark: Please set default "
+                               "settings first!")
+            return
+
+        self.settingsChanged(ctx.message.author.server.id)
+        if isSet:
+            await self.bot.say(":white_check_mark: Server Welcome/Leave - Log Summary: "
+                               "Enabled.  Joins and leaves will be logged in one "
+                               "message every {} seconds.".format(SUMMARY_INTERVAL))
+            LOGGER.info("Log summary ENABLED by %s#%s (%s)",
+                        ctx.message.author.name,
+                        ctx.message.author.discriminator,
+                        ctx.message.author.id)
+        else:
+            await self.bot.say(":negative_squared_cross_mark: Server Welcome/Leave "
+                               "- Log Summary: Disabled.")
+            LOGGER.info("Log summary DISABLED by %s#%s (%s)",
+                        ctx.message.author.name,
+                        ctx.message.author.discriminator,
+                        ctx.message.author.id)
+
     #[p]welcome setlog
     @_welcome.command(pass_context=True, no_pm=True, name="setlog")
     @checks.serverowner() #Only allow server owner to execute the following command.
     async def setLog(self, ctx):
         """Enables, and sets current channel as log channel."""
-        self.loadSettings()
         serverId = ctx.message.author.server.id
         try:
             self.settings[serverId][self.keyWelcomeLogChannel] = ctx.message.channel.id
@@ -269,7 +687,7 @@ class Welcome: # pylint: disable=too-many-instance-attributes
                                "settings first!")
             print(errorMsg)
         else:
-            self.saveSettings()
+            self.settingsChanged(ctx.message.author.server.id)
             await self.bot.say(":white_check_mark: Server Welcome/Leave - Logging: "
                                "Enabled, and will be logged to this channel only.")
             LOGGER.info("Welcome channel changed by %s#%s (%s)",
@@ -297,7 +715,6 @@ class Welcome: # pylint: disable=too-many-instance-attributes
 
         if str.lower(message.content) == "yes":
             try:
-                self.loadSettings()
                 serverId = ctx.message.author.server.id
                 self.settings[serverId] = {}
                 self.settings[serverId][self.keyWelcomeMessage] = DEFAULT_MESSAGE
@@ -308,7 +725,7 @@ class Welcome: # pylint: disable=too-many-instance-attributes
                 self.settings[serverId][self.keyWelcomeLogChannel] = None
                 self.settings[serverId][self.keyLeaveLogEnabled] = False
                 self.settings[serverId][self.keyLeaveLogChannel] = None
-                self.saveSettings()
+                self.settingsChanged(ctx.message.author.server.id)
             except Exception as errorMsg: # pylint: disable=broad-except
                 await self.bot.say(":no_entry: Could not set default settings! "
                                    "Please check the server logs.")
@@ -344,14 +761,13 @@ class Welcome: # pylint: disable=too-many-instance-attributes
             return
 
         try:
-            self.loadSettings()
             serverId = ctx.message.author.server.id
             if serverId in self.settings:
                 self.settings[serverId][self.keyWelcomeTitle] = title.content
             else:
                 self.settings[serverId] = {}
                 self.settings[serverId][self.keyWelcomeTitle] = title.content
-            self.saveSettings()
+            self.settingsChanged(ctx.message.author.server.id)
         except Exception as errorMsg: # pylint: disable=broad-except
             await self.bot.say("Could not save settings! Please check server logs!")
             print(errorMsg)
@@ -372,14 +788,13 @@ class Welcome: # pylint: disable=too-many-instance-attributes
             imageUrl = None
 
         try:
-            self.loadSettings()
             serverId = ctx.message.author.server.id
             if serverId in self.settings:
                 self.settings[serverId][self.keyWelcomeImage] = imageUrl
             else:
                 self.settings[serverId] = {}
                 self.settings[serverId][self.keyWelcomeImage] = imageUrl
-            self.saveSettings()
+            self.settingsChanged(ctx.message.author.server.id)
         except Exception as errorMsg: # pylint: disable=broad-except
             await self.bot.say("Could not save settings! Please check server logs!")
             print(errorMsg)
@@ -400,6 +815,20 @@ class Welcome: # pylint: disable=too-many-instance-attributes
         await self.sendWelcomeMessage(ctx.message.author, test=True)
         await self.bot.say("If this server has been configured, you should have received a DM.")
 
+    #[p]welcome stats
+    @_welcome.command(pass_context=True, no_pm=False)
+    @checks.serverowner() #Only allow server owner to execute the following command.
+    async def stats(self, ctx): # pylint: disable=unused-argument
+        """Show message delivery statistics since the cog was loaded."""
+        await self.bot.say("```Queued:  {queued}\n"
+                           "Sent:    {sent}\n"
+                           "Retried: {retried}\n"
+                           "Failed:  {failed}\n"
+                           "Dropped: {dropped}\n"
+                           "Waiting: {waiting}```".format(
+                                               waiting=self.pending,
+                                               **self.deliveryStats))
+
 
 def setup(bot):
     """Add the cog to the bot."""